@@ -0,0 +1,353 @@
+import numpy as np
+import pandas as pd
+
+
+#---------ROW SELECTION-------------
+
+# Titles with a score and a type, the ones most charts cover
+def scored_rows(anime):
+    return anime['Score'].notna() & anime['Type'].notna()
+
+
+#---------YEAR x TYPE x GENRE CUBE-------------
+
+CUBE_MEASURES = ['Score', 'Popularity', 'Members', 'Favorites',
+                 'Watching', 'Completed', 'On-Hold', 'Dropped', 'Plan to Watch']
+
+ENGAGEMENT_COLUMNS = ['Watching', 'Completed', 'On-Hold', 'Dropped', 'Plan to Watch']
+
+SEASON_MEASURES = ['Score', 'Members', 'Airing Days']
+
+
+# Sum and non-missing count of every measure, plus the number of titles, per group.
+# Missing keys are kept as their own group so totals still cover every title, and only
+# combinations that occur are listed when a key is categorical.
+def summarize(frame, keys, measures=CUBE_MEASURES):
+    grouped = frame.groupby(keys, dropna=False, observed=True)
+    summary = pd.concat({'sum': grouped[measures].sum(),
+                         'count': grouped[measures].count()}, axis=1)
+    summary[('count', 'Titles')] = grouped.size()
+    return summary
+
+
+# A summary after taking out the groups of removed rows and adding those of added rows.
+# Groups left without titles are dropped.
+def combine(summary, removed, added):
+    merged = summary.add(added, fill_value=0).sub(removed, fill_value=0)
+    merged = merged[merged[('count', 'Titles')] > 0]
+    return merged.astype(summary.dtypes.to_dict())
+
+
+# Summary of the rows behind both summaries, e.g. of two chunks of the dataset
+def add_summaries(first, second):
+    return first.add(second, fill_value=0).astype(first.dtypes.to_dict())
+
+
+def finish(sums, counts, stat):
+    if stat == 'sum':
+        return sums
+    if stat == 'count':
+        return counts[counts > 0]
+    return (sums / counts).dropna()
+
+
+def summarize_by_type(anime):
+    return summarize(anime, ['Year', 'Type'])
+
+
+def summarize_by_genre(anime):
+    exploded = anime[['Year', 'Type', 'Genre List'] + CUBE_MEASURES].explode('Genre List')
+    exploded = exploded.rename(columns={'Genre List': 'Genre'}).dropna(subset=['Genre'])
+    return summarize(exploded, ['Year', 'Type', 'Genre'])
+
+
+# Counts and sums of the measures by Year and Type, and by Year, Type and Genre.
+# Charts slice these small tables instead of grouping the raw rows.
+class AggregateCube:
+
+    def __init__(self, anime):
+        self.set_summaries(summarize_by_type(anime), summarize_by_genre(anime))
+
+    # A cube of summaries made elsewhere, e.g. added up over the chunks of a streaming read
+    @classmethod
+    def from_summaries(cls, by_type, by_genre):
+        return cls.__new__(cls).set_summaries(by_type, by_genre)
+
+    def set_summaries(self, by_type, by_genre):
+        self.by_type, self.by_genre = by_type, by_genre
+        self.types = self.by_type.index.get_level_values('Type').dropna().unique().tolist()
+        return self
+
+    # Brings the cube in step with a change to the dataset: removed holds the old versions of
+    # changed or deleted titles and added their new versions plus new titles. Costs time
+    # proportional to those rows, not to the dataset.
+    def update(self, removed, added):
+        return self.set_summaries(combine(self.by_type, summarize_by_type(removed), summarize_by_type(added)),
+                                  combine(self.by_genre, summarize_by_genre(removed), summarize_by_genre(added)))
+
+    def select(self, type=None, genre=None):
+        cube = self.by_type if genre is None else self.by_genre
+        if type is not None:
+            cube = cube[cube.index.get_level_values('Type') == type]
+        if genre is not None:
+            cube = cube[cube.index.get_level_values('Genre') == genre]
+        return cube
+
+    # Per-year count, sum or mean of a measure ('Titles' counts every title), optionally
+    # for one type and/or genre. Years are whole numbers; titles without a year are left out.
+    def by_year(self, measure, stat='count', type=None, genre=None):
+        cube = self.select(type, genre)
+        sums = cube['sum'][measure].groupby(level='Year').sum() if stat != 'count' else None
+        counts = cube['count'][measure].groupby(level='Year').sum()
+        series = finish(sums, counts, stat)
+        series.index = series.index.astype(int)
+        return series
+
+    # Per-genre count, sum or mean of a measure, largest first
+    def by_genre_total(self, measure, stat='sum', type=None):
+        cube = self.by_genre
+        if type is not None:
+            cube = cube[cube.index.get_level_values('Type') == type]
+        sums = cube['sum'][measure].groupby(level='Genre').sum() if stat != 'count' else None
+        counts = cube['count'][measure].groupby(level='Genre').sum()
+        return finish(sums, counts, stat).sort_values(ascending=False)
+
+    # Count, sum or mean of each measure over every title
+    def totals(self, measures, stat='sum'):
+        sums = self.by_type['sum'][measures].sum() if stat != 'count' else None
+        counts = self.by_type['count'][measures].sum()
+        return finish(sums, counts, stat)
+
+    # Titles of every genre/type pair with a type, genres as rows and types as columns
+    def genre_type_counts(self):
+        titles = self.by_genre[('count', 'Titles')]
+        titles = titles[titles.index.get_level_values('Type').notna()]
+        counts = titles.groupby(level=['Genre', 'Type'], observed=True).sum()
+        return counts.unstack('Type', fill_value=0).astype(np.int64)
+
+
+#---------SEASONS-------------
+
+# Summary of the season measures per premiere season and year; adds up like the cube's
+def summarize_by_season(anime):
+    return summarize(anime, ['Season Year', 'Season'], SEASON_MEASURES)
+
+
+# Titles and the average season measures of each season of the year
+def season_stats(summary):
+    by_season = summary.groupby(level='Season', observed=True).sum()
+    stats = (by_season['sum'][SEASON_MEASURES] / by_season['count'][SEASON_MEASURES]).add_prefix('Average ')
+    stats.insert(0, 'Titles', by_season[('count', 'Titles')])
+    return stats
+
+
+# Titles per year of each season
+def season_trends(summary):
+    titles = summary[('count', 'Titles')].dropna()
+    titles = titles[titles.index.get_level_values('Season').notna()]
+    return {season: series.droplevel('Season').rename(index=int).rename_axis('Year').rename('Titles')
+            for season, series in titles.groupby(level='Season', observed=True)}
+
+
+#---------PRE-BINNED HISTOGRAMS-------------
+
+# Fine-grained counts of one column with running totals, so the histogram and KDE of any
+# value range come from slicing arrays instead of re-binning the rows. Weights count each
+# value that many times, so distinct values and their counts give the same histogram.
+class Histogram:
+
+    def __init__(self, values, fine_bins=10000, weights=None):
+        values = np.asarray(values, dtype=float)
+        present = ~np.isnan(values)
+        values = values[present]
+        if weights is not None:
+            weights = np.asarray(weights)[present]
+        self.low, self.high = values.min(), values.max()
+
+        # Whole numbers such as episode counts get one fine bin per value
+        if np.array_equal(values, np.round(values)) and self.high - self.low <= fine_bins:
+            self.edges = np.arange(self.low - 0.5, self.high + 1.5)
+        else:
+            self.edges = np.linspace(self.low, self.high, fine_bins + 1)
+        self.centers = (self.edges[:-1] + self.edges[1:]) / 2
+        self.counts = np.histogram(values, self.edges, weights=weights)[0].astype(np.int64)
+
+        self.running_counts = np.concatenate([[0], np.cumsum(self.counts)])
+        self.running_sums = np.concatenate([[0], np.cumsum(self.counts * self.centers)])
+        self.running_squares = np.concatenate([[0], np.cumsum(self.counts * self.centers ** 2)])
+
+    # Fine bins overlapping [low, high], trimmed to the first and last non-empty bin
+    def fine_range(self, low, high):
+        start = np.searchsorted(self.edges[1:], low, 'right')
+        stop = np.searchsorted(self.edges[:-1], high, 'right')
+        filled = np.flatnonzero(self.counts[start:stop])
+        if len(filled) == 0:
+            return start, start
+        return start + filled[0], start + filled[-1] + 1
+
+    # Edges and counts of about `bins` bins covering the values in [low, high]
+    def histogram(self, low, high, bins=30):
+        start, stop = self.fine_range(low, high)
+        if start == stop:
+            return np.array([]), np.array([], dtype=int)
+        cuts = np.unique(np.linspace(start, stop, bins + 1).round().astype(int))
+        return self.edges[cuts], np.diff(self.running_counts[cuts])
+
+    # Gaussian KDE of the values in [low, high], evaluated on about `grid` points. Uses Scott's
+    # bandwidth from the binned mean and variance of that range and the binned counts as samples.
+    def kde(self, low, high, grid=200):
+        start, stop = self.fine_range(low, high)
+        n = self.running_counts[stop] - self.running_counts[start]
+        if n < 2:
+            return np.array([]), np.array([])
+
+        mean = (self.running_sums[stop] - self.running_sums[start]) / n
+        variance = ((self.running_squares[stop] - self.running_squares[start]) / n - mean ** 2) * n / (n - 1)
+        bandwidth = np.sqrt(max(variance, 0)) * n ** (-1 / 5)
+        if bandwidth == 0:
+            return np.array([]), np.array([])
+
+        cuts = np.unique(np.linspace(start, stop, grid + 1).round().astype(int))
+        counts = np.diff(self.running_counts[cuts])
+        centers = (self.running_sums[cuts[1:]] - self.running_sums[cuts[:-1]]) / np.maximum(counts, 1)
+        points = (self.edges[cuts[:-1]] + self.edges[cuts[1:]]) / 2
+
+        distances = (points[:, None] - centers[None, :]) / bandwidth
+        density = np.exp(-0.5 * distances ** 2) @ counts / (n * bandwidth * np.sqrt(2 * np.pi))
+        return points, density
+
+
+#---------STATISTICS FROM VALUE COUNTS-------------
+
+# Series.describe() of the values counted in counts, a Series of counts indexed by value
+# and named like the counted column
+def describe_counts(counts):
+    counts = counts[counts > 0].sort_index()
+    values, weights = counts.index.to_numpy(dtype=float), counts.to_numpy()
+    n = weights.sum()
+    mean = values @ weights / n
+    std = np.sqrt((values - mean) ** 2 @ weights / (n - 1)) if n > 1 else np.nan
+
+    # Linear interpolation between the sorted values on either side, like Series.quantile
+    running = np.cumsum(weights)
+    def quantile(q):
+        position = (n - 1) * q
+        lower, upper = values[np.searchsorted(running, [np.floor(position), np.ceil(position)], 'right')]
+        return lower + (upper - lower) * (position - np.floor(position))
+
+    return pd.Series({'count': float(n), 'mean': mean, 'std': std, 'min': values[0],
+                      '25%': quantile(0.25), '50%': quantile(0.5), '75%': quantile(0.75), 'max': values[-1]},
+                     name=counts.index.name)
+
+
+# Bin edges of numpy's 'auto' rule for the values counted in counts; seaborn can't apply
+# the rule itself to weighted data
+def auto_bin_edges(counts):
+    stats = describe_counts(counts)
+    low, high, n = stats['min'], stats['max'], stats['count']
+    if low == high:
+        return np.array([low - 0.5, high + 0.5])
+    width = (high - low) / (np.log2(n) + 1)
+    iqr = stats['75%'] - stats['25%']
+    if iqr > 0:
+        width = min(width, 2 * iqr * n ** (-1 / 3))
+    return np.linspace(low, high, int(np.ceil((high - low) / width)) + 1)
+
+
+#---------SCATTER DOWNSAMPLING-------------
+
+# Most points a scatter chart sends to the browser
+SCATTER_POINT_BUDGET = 5000
+
+
+def grid_cells(values, cells, log):
+    values = np.asarray(values, dtype=float)
+    if log:
+        values = np.log10(np.where(values > 0, values, np.nan))
+    edges = np.linspace(np.nanmin(values), np.nanmax(values), cells + 1)
+    # Values that can't be placed (non-positive on a log axis) share the last cell
+    return np.where(np.isnan(values), cells, np.clip(np.digitize(values, edges[1:-1]), 0, cells - 1))
+
+
+# At most `budget` rows of frame, sampled evenly across a grid laid over the x/y plane as
+# drawn (log axes binned in log space). Sparse cells and outliers are kept whole and
+# crowded cells are thinned to the same cap.
+def downsample(frame, x, y, budget=SCATTER_POINT_BUDGET, log_x=False, log_y=False, cells=64, seed=0):
+    if len(frame) <= budget:
+        return frame
+    cell_ids = grid_cells(frame[x], cells, log_x) * (cells + 1) + grid_cells(frame[y], cells, log_y)
+
+    order = np.random.default_rng(seed).permutation(len(frame))
+    ranks = pd.Series(cell_ids[order]).groupby(cell_ids[order]).cumcount().to_numpy()
+
+    # Largest per-cell cap that keeps the total within the budget
+    counts = np.bincount(cell_ids)
+    low, high = 0, counts.max()
+    while low < high:
+        cap = (low + high + 1) // 2
+        if np.minimum(counts, cap).sum() <= budget:
+            low = cap
+        else:
+            high = cap - 1
+    return frame.iloc[np.sort(order[ranks < low])]
+
+
+# Count, x range, means and centered sums of squares and products of the x/y pairs. Moments
+# of two sets of pairs merge exactly into those of both, so chunks can be summarized one at a time.
+def scatter_moments(pairs, x, y):
+    xs, ys = pairs[x].to_numpy(dtype=float), pairs[y].to_numpy(dtype=float)
+    mean_x, mean_y = (xs.mean(), ys.mean()) if len(xs) else (0.0, 0.0)
+    min_x, max_x = (xs.min(), xs.max()) if len(xs) else (np.nan, np.nan)
+    dx, dy = xs - mean_x, ys - mean_y
+    return {'rows': len(xs), 'min_x': min_x, 'max_x': max_x, 'mean_x': mean_x, 'mean_y': mean_y,
+            'xx': dx @ dx, 'yy': dy @ dy, 'xy': dx @ dy}
+
+
+def merge_moments(first, second):
+    rows = first['rows'] + second['rows']
+    if rows == 0:
+        return first
+    dx, dy = second['mean_x'] - first['mean_x'], second['mean_y'] - first['mean_y']
+    share = first['rows'] * second['rows'] / rows
+    return {'rows': rows,
+            'min_x': np.fmin(first['min_x'], second['min_x']),
+            'max_x': np.fmax(first['max_x'], second['max_x']),
+            'mean_x': first['mean_x'] + dx * second['rows'] / rows,
+            'mean_y': first['mean_y'] + dy * second['rows'] / rows,
+            'xx': first['xx'] + second['xx'] + dx * dx * share,
+            'yy': first['yy'] + second['yy'] + dy * dy * share,
+            'xy': first['xy'] + second['xy'] + dx * dy * share}
+
+
+# Correlation and OLS line of y on x, with the x range the line is drawn over
+def fit_moments(moments):
+    slope = moments['xy'] / moments['xx']
+    return {'correlation': moments['xy'] / np.sqrt(moments['xx'] * moments['yy']),
+            'slope': slope, 'intercept': moments['mean_y'] - slope * moments['mean_x'],
+            'x_range': (moments['min_x'], moments['max_x'])}
+
+
+# Correlation and OLS line over every pair, with a downsampled set of points to draw and the
+# moments to merge it with the summary of other pairs
+def scatter_summary(frame, x, y, budget=SCATTER_POINT_BUDGET, log_x=False, log_y=False):
+    pairs = frame[[x, y]].dropna()
+    moments = scatter_moments(pairs, x, y)
+    return {
+        'points': downsample(pairs, x, y, budget, log_x, log_y),
+        'rows': moments['rows'],
+        'moments': moments,
+        **fit_moments(moments),
+    }
+
+
+# Scatter summary of the pairs behind both summaries. The points are downsampled again
+# from both sets, so they stay within the budget but aren't a uniform sample.
+def merge_scatter(first, second, x, y, budget=SCATTER_POINT_BUDGET, log_x=False, log_y=False):
+    moments = merge_moments(first['moments'], second['moments'])
+    points = pd.concat([first['points'], second['points']], ignore_index=True)
+    return {
+        'points': downsample(points, x, y, budget, log_x, log_y),
+        'rows': moments['rows'],
+        'moments': moments,
+        **fit_moments(moments),
+    }
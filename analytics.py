@@ -0,0 +1,265 @@
+import argparse
+import concurrent.futures
+import os
+import time
+
+import joblib
+
+import aggregates
+import dataset
+import refresh
+import storage
+import streaming
+import versions
+
+# Part of the report file name; bumped whenever an analysis or its output changes
+REPORT_FORMAT = 3
+
+# Ends the data version of reports built from a streaming summary
+STREAMING_SUFFIX = versions.STREAMING_SUFFIX
+
+# Scored titles shown in the data preview
+PREVIEW_ROWS = 5
+
+
+#---------ANALYSES-------------
+
+# Every analysis of the dashboard as a pure function of the cleaned frame and its aggregate
+# cube, with no Streamlit calls. Analyses of the cube alone also run on a streaming summary,
+# where there is no frame.
+
+def preview(anime, cube):
+    return anime[aggregates.scored_rows(anime)].head(PREVIEW_ROWS)
+
+
+def score_stats(anime, cube):
+    return anime.loc[aggregates.scored_rows(anime), 'Score'].describe()
+
+
+def score_histogram(anime, cube):
+    return aggregates.Histogram(anime.loc[aggregates.scored_rows(anime), 'Score'])
+
+
+def episode_histogram(anime, cube):
+    return aggregates.Histogram(anime.loc[aggregates.scored_rows(anime), 'Episodes'])
+
+
+# Descriptive statistics of every title's episode count, and the titles without one
+def episode_stats(anime, cube):
+    return {'stats': anime['Episodes'].describe(), 'missing': int(anime['Episodes'].isna().sum())}
+
+
+# Number of rated titles of each genre at each score, per genre
+def genre_scores(anime, cube):
+    rated = anime[['Genre List', 'Score']].dropna(subset=['Score']).explode('Genre List').dropna()
+    counts = rated.groupby(['Genre List', 'Score']).size()
+    return {genre: counts.xs(genre) for genre in counts.index.get_level_values(0).unique()}
+
+
+def score_popularity(anime, cube):
+    return aggregates.scatter_summary(anime, 'Score', 'Members', aggregates.SCATTER_POINT_BUDGET, log_y=True)
+
+
+def episodes_score(anime, cube):
+    return aggregates.scatter_summary(anime, 'Episodes', 'Score', aggregates.SCATTER_POINT_BUDGET, log_x=True)
+
+
+# Titles, average score, members and airing days of each premiere season
+def season_stats(anime, cube):
+    return aggregates.season_stats(aggregates.summarize_by_season(anime))
+
+
+# Titles per year of each premiere season
+def season_trends(anime, cube):
+    return aggregates.season_trends(aggregates.summarize_by_season(anime))
+
+
+def genres(anime, cube):
+    return sorted(cube.by_genre.index.get_level_values('Genre').unique())
+
+
+def types(anime, cube):
+    return cube.types
+
+
+# Scored titles of each genre, most common first
+def genre_counts(anime, cube):
+    scored = cube.by_genre[('count', 'Score')]
+    scored = scored[scored.index.get_level_values('Type').notna()]
+    return scored.groupby(level='Genre', observed=True).sum().sort_values(ascending=False)
+
+
+# Scored titles of each type, most common first
+def type_counts(anime, cube):
+    counts = cube.by_type[('count', 'Score')].groupby(level='Type', observed=True).sum()
+    return counts[counts > 0].sort_values(ascending=False)
+
+
+def score_trend(anime, cube):
+    return cube.by_year('Score', 'mean')
+
+
+def airing_trend(anime, cube):
+    return cube.by_year('Score', 'count')
+
+
+def popularity_trend(anime, cube):
+    return cube.by_year('Popularity', 'mean')
+
+
+# Titles per year of each type
+def type_trends(anime, cube):
+    return {type: cube.by_year('Titles', 'count', type=type) for type in cube.types}
+
+
+# Scored titles per year of each genre
+def genre_trends(anime, cube):
+    return {genre: cube.by_year('Score', 'count', genre=genre) for genre in genres(anime, cube)}
+
+
+def genre_favorites(anime, cube):
+    return cube.by_genre_total('Favorites')
+
+
+def genre_type_counts(anime, cube):
+    return cube.genre_type_counts()
+
+
+def engagement(anime, cube):
+    return cube.totals(aggregates.ENGAGEMENT_COLUMNS)
+
+
+# Report key -> analysis
+ANALYSES = {
+    'preview': preview,
+    'score_stats': score_stats,
+    'score_histogram': score_histogram,
+    'episode_histogram': episode_histogram,
+    'episode_stats': episode_stats,
+    'genre_scores': genre_scores,
+    'score_popularity': score_popularity,
+    'episodes_score': episodes_score,
+    'season_stats': season_stats,
+    'season_trends': season_trends,
+    'genres': genres,
+    'types': types,
+    'genre_counts': genre_counts,
+    'type_counts': type_counts,
+    'score_trend': score_trend,
+    'airing_trend': airing_trend,
+    'popularity_trend': popularity_trend,
+    'type_trends': type_trends,
+    'genre_trends': genre_trends,
+    'genre_favorites': genre_favorites,
+    'genre_type_counts': genre_type_counts,
+    'engagement': engagement,
+}
+
+# Analyses that read individual titles; a streaming summary has their results instead
+ROW_ANALYSES = ['preview', 'score_stats', 'score_histogram', 'episode_histogram', 'episode_stats',
+                'genre_scores', 'score_popularity', 'episodes_score', 'season_stats', 'season_trends']
+
+
+#---------REPORTS-------------
+
+def build_report(anime, cube):
+    return {name: analysis(anime, cube) for name, analysis in ANALYSES.items()}
+
+
+# The same report from a streaming summary: the cube analyses run on its cube and the rest
+# come from its value counts and scatter summaries
+def summary_report(summary):
+    report = {name: analysis(None, summary.cube) for name, analysis in ANALYSES.items() if name not in ROW_ANALYSES}
+    episodes = summary.describe('Episodes')
+    report.update({
+        'preview': summary.head.head(PREVIEW_ROWS),
+        'score_stats': aggregates.describe_counts(summary.scored_counts['Score']),
+        'score_histogram': summary.histogram('Score'),
+        'episode_histogram': summary.histogram('Episodes'),
+        'episode_stats': {'stats': episodes, 'missing': summary.rows - int(episodes['count'])},
+        'genre_scores': {genre: summary.genre_score_counts(genre)
+                         for genre in sorted(summary.genre_scores.index.unique('Genre'))},
+        'score_popularity': summary.scatters['Score', 'Members'],
+        'episodes_score': summary.scatters['Episodes', 'Score'],
+        'season_stats': aggregates.season_stats(summary.seasons),
+        'season_trends': aggregates.season_trends(summary.seasons),
+    })
+    return report
+
+
+# Each worker process loads the frame and cube once, from the caches the parent built
+def start_worker(path, delta_dir, cache_dir):
+    global worker_data
+    worker_data = refresh.refresh(path, delta_dir, cache_dir)
+
+
+def run_analysis(name):
+    return name, ANALYSES[name](*worker_data)
+
+
+# The report of the CSV and its deltas, with the analyses spread over `workers` processes
+def precompute(path=dataset.ANIME_CSV, delta_dir=refresh.DELTA_DIR, cache_dir=dataset.CACHE_DIR, workers=None):
+    anime, cube = refresh.refresh(path, delta_dir, cache_dir)
+    if workers == 1:
+        return build_report(anime, cube)
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=start_worker,
+                                                initargs=(path, delta_dir, cache_dir)) as pool:
+        results = dict(pool.map(run_analysis, ANALYSES))
+    return {name: results[name] for name in ANALYSES}
+
+
+#---------STORED REPORTS-------------
+
+report_version = versions.report_version
+
+
+def report_path(path=dataset.ANIME_CSV, delta_dir=refresh.DELTA_DIR, cache_dir=dataset.CACHE_DIR, streamed=False):
+    version = report_version(path, delta_dir, streamed)
+    return f'{dataset.cache_prefix(path, cache_dir)}-report-{version}-v{REPORT_FORMAT}.joblib'
+
+
+def write_report(report, target, path=dataset.ANIME_CSV, cache_dir=dataset.CACHE_DIR):
+    storage.dump(report, target)
+
+    # Dropping reports of older versions of the same CSV, built in the same mode
+    streamed = f'{STREAMING_SUFFIX}-v' in target
+    storage.drop_stale(f'{dataset.cache_prefix(path, cache_dir)}-report-*.joblib', keep=[target],
+                       belongs=lambda stale: (f'{STREAMING_SUFFIX}-v' in stale) == streamed)
+    return target
+
+
+# The stored report of the current data version, computed in this process when no
+# precompute run has stored it yet
+def load_report(path=dataset.ANIME_CSV, delta_dir=refresh.DELTA_DIR, cache_dir=dataset.CACHE_DIR, streamed=False):
+    target = report_path(path, delta_dir, cache_dir, streamed)
+    if os.path.exists(target):
+        return joblib.load(target)
+    if streamed:
+        report = summary_report(streaming.load_summary(path, cache_dir))
+    else:
+        report = build_report(*refresh.refresh(path, delta_dir, cache_dir))
+    write_report(report, target, path, cache_dir)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute every analysis of the dashboard into the report cache')
+    parser.add_argument('csv', nargs='?', default=dataset.ANIME_CSV)
+    parser.add_argument('--delta-dir', default=refresh.DELTA_DIR)
+    parser.add_argument('--cache-dir', default=dataset.CACHE_DIR)
+    parser.add_argument('--workers', type=int, default=None, help='processes to use (default: one per CPU)')
+    parser.add_argument('--streaming', action='store_true', help='summarize the CSV in chunks instead of loading it')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.streaming:
+        report = summary_report(streaming.load_summary(args.csv, args.cache_dir))
+    else:
+        report = precompute(args.csv, args.delta_dir, args.cache_dir, args.workers)
+    target = report_path(args.csv, args.delta_dir, args.cache_dir, args.streaming)
+    print(write_report(report, target, args.csv, args.cache_dir))
+    print(f'{len(report)} analyses in {time.perf_counter() - started:.2f}s')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,23 @@
+import inspect
+import time
+
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import requests
 import numpy as np 
-import plotly.express as px
 from streamlit_lottie import st_lottie
-from collections import Counter
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import MultiLabelBinarizer, LabelEncoder
+
+import analytics
+import assets
+import dataset
+import export
+import figures
+import profiler
+import rating_model
+import refresh
+import streaming
+from genre_index import GenreIndex
+from similarity import SimilarityIndex
+from title_index import TitleIndex
 
 #---------------CSS------------------
 
@@ -32,41 +40,145 @@ def custom_css():
 
 st.set_page_config(page_title="My Webpage", page_icon=":tada:")
 
+# Records timings of this run's sections and loaders when APP_PROFILE=1
+profiler.start_run()
+
 custom_css()
 
 
 #---------LOTTIE-------------
 
-def load_lottieurl(url):
-    r = requests.get(url)
-    if r.status_code != 200:
-        return None
-    return r.json()
+# Animations are read from the local store; missing ones are downloaded once per process
+# in the background and show up on a later rerun
+@st.cache_resource
+def start_lottie_refresh():
+    if assets.REFRESH_ENABLED:
+        assets.refresh_in_background(assets.LOTTIE_URLS.values())
 
-lottie_coding = load_lottieurl("https://lottie.host/5ae5c403-6777-4ddc-9d4b-69b991f2244e/SrRQPFgsnv.json")
+start_lottie_refresh()
+
+lottie_coding = assets.load_animation(assets.LOTTIE_URLS['coding'])
 
 st.title('Anime Analytics Pro')
 
 with st.container():
     st.write("---")
-    st_lottie(lottie_coding, height=300, key="coding")
-    
-    
+    if lottie_coding:
+        st_lottie(lottie_coding, height=300, key="coding")
+
+
 #---------DATAFRAME-------------
 
-@st.cache_data 
-def load_data():
-    data = pd.read_csv('anime.csv') 
-    data['Score'] = pd.to_numeric(data['Score'], errors='coerce')
-    return data.dropna(subset=['Score', 'Type'])
+# Derived frames copy on write, so filtering and column selections on the shared frame
+# below never copy up front and never write back into it
+pd.set_option('mode.copy_on_write', True)
+
+# Data versions the loaders below keep. Every delta file makes a new version, and the
+# frame, indexes, report and models of the one before it are dropped with it.
+KEPT_VERSIONS = 1
+
+# anime.csv and its delta files are loaded once per data version into one read-only frame
+# shared by every session; sections work on views of it and never add or assign columns.
+# A new delta only costs merging it into the stored frame and aggregates.
+@profiler.cached(st.cache_resource(max_entries=KEPT_VERSIONS))
+def load_anime(version):
+    return dataset.freeze(refresh.refresh(dataset.ANIME_CSV)[0])
+
+# Every chart's numbers, computed once per data version by analytics.py or ahead of time by
+# its batch command; the sections below only render them. With APP_STREAMING=1 they come
+# from a summary read in chunks, so catalogs larger than memory can be charted; there is no
+# frame then and no deltas are applied.
+@profiler.cached(st.cache_resource(max_entries=KEPT_VERSIONS))
+def load_report(version):
+    return analytics.load_report(dataset.ANIME_CSV, streamed=streaming.ENABLED)
+
+if streaming.ENABLED:
+    version = analytics.report_version(dataset.ANIME_CSV, streamed=True)
+    anime = None
+else:
+    version = refresh.data_version(dataset.ANIME_CSV)
+    anime = load_anime(version)
+report = load_report(version)
+
+# One genre vocabulary and title x genre matrix shared by every genre filter
+@profiler.cached(st.cache_resource(max_entries=KEPT_VERSIONS))
+def load_genre_index(_anime, version):
+    return GenreIndex(_anime['Genre List'])
+
+# Genre, type, studio and numeric features of every title for "more like this" queries
+@profiler.cached(st.cache_resource(max_entries=KEPT_VERSIONS))
+def load_similarity_index(_anime, version):
+    return SimilarityIndex(_anime, load_genre_index(_anime, version))
+
+# Trigram index over every title's names for the search box
+@profiler.cached(st.cache_resource(max_entries=KEPT_VERSIONS))
+def load_title_index(_anime, version):
+    return TitleIndex(_anime)
+
+# Titles a title picker offers before anything is searched, most popular first
+PICKER_TITLES = 50
+
+# Every title's name as the title pickers label it, and the most popular titles' positions
+@profiler.cached(st.cache_resource(max_entries=KEPT_VERSIONS))
+def load_title_names(_anime, version):
+    popular = np.argsort(-_anime['Members'].fillna(0).to_numpy(), kind='stable')[:PICKER_TITLES]
+    return _anime['Name'].astype(object).to_numpy(), popular
+
+# Trained once per data version and estimator and kept on disk, on a background thread so
+# page interactions never wait for training
+@profiler.cached(st.cache_resource(max_entries=KEPT_VERSIONS * len(rating_model.ESTIMATORS)))
+def start_training(_anime, version, estimator, attempt):
+    return rating_model.TrainingJob(_anime, version, estimator=estimator).start()
+
+# Retries of failed training per (version, estimator), shared by every session. A retry
+# asks start_training for the next attempt, which misses the cache and starts a new job.
+@st.cache_resource
+def training_attempts():
+    return {}
+
+def training_job(estimator):
+    return start_training(anime, version, estimator, training_attempts().get((version, estimator), 0))
+
+# The default model starts training with the first page load, whichever section it shows
+if anime is not None:
+    training_job(rating_model.DEFAULT_ESTIMATOR)
+
+# Matplotlib charts as PNG bytes, keyed by chart name, parameters and data version, so a chart
+# is drawn once and every later view of it is served from the cache. Charts at the default
+# settings are read from the chart cache an export or warm-up run left on disk.
+@profiler.cached(st.cache_data(max_entries=figures.FIGURE_CACHE_SIZE))
+def render_chart(chart, version, **params):
+    return export.cached_chart(version, chart, params) or figures.render_chart(chart, report, **params)
+
+def show_chart(chart, **params):
+    st.image(render_chart(chart, version, **params), use_column_width=True)
+
+
+#---------NAVIGATION-------------
+
+# On Streamlit versions with fragments, a widget change reruns only its own section
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
+
+# Reruns the section it is called from where st.rerun can be scoped to a fragment, and the
+# whole script otherwise, as on Streamlit 1.28
+if 'scope' in inspect.signature(st.rerun).parameters:
+    rerun_section = lambda: st.rerun(scope='fragment')
+else:
+    rerun_section = st.rerun
 
-data = load_data()
 
-# Displays subset
-st.subheader('Subset of Data')
-st.dataframe(data.head()) 
+def get_query_section():
+    if hasattr(st, 'query_params'):
+        return st.query_params.get('section')
+    return st.experimental_get_query_params().get('section', [None])[0]
 
 
+def set_query_section(section):
+    if hasattr(st, 'query_params'):
+        st.query_params['section'] = section
+    else:
+        st.experimental_set_query_params(section=section)
+
 
 #-----------GENERAL STATISTICS--------------
 
@@ -94,9 +206,15 @@ st.dataframe(data.head())
 #     main()
 
 
-st.subheader('General Statistics')
+@fragment
+def overview_section():
+    # Displays subset
+    st.subheader('Subset of Data')
+    st.dataframe(report['preview'])
+
+    st.subheader('General Statistics')
 
-st.write("""
+    st.write("""
 ### 
 - **MAL_ID**: The IDs range from 1 to 48,492, indicating a large and diverse set of anime titles.
 - **Popularity**: Varies widely, indicating a mixed set of well-known and lesser-known anime.
@@ -105,93 +223,63 @@ st.write("""
 - **Watching, Completed, On-Hold, Dropped, Plan to Watch**: These columns provide insights into how viewers engage with the anime, showing large variations in viewer behavior.
 """)
 
-st.markdown("""
+    st.markdown("""
 ### Score Statistics
 - **Mean Score**: The average score is approximately 6.51, on a scale from 1.85 to 9.19.
 - **Standard Deviation**: The standard deviation of 0.89 indicates a moderate spread in the scores.
 - **Median Score**: The median score is 6.52, very close to the mean, suggesting a relatively symmetric distribution of scores.
 """)
 
-#---------DISTRIBUTION OF ANIME SCORES----------
 
-df = load_data() 
+#---------DISTRIBUTION OF ANIME SCORES----------
 
-# Converting score column to numeric 
-df['Score'] = pd.to_numeric(df['Score'], errors='coerce')
+@fragment
+def score_distribution_section():
+    st.title('Distribution of Anime Scores')
 
-st.title('Distribution of Anime Scores')
+    score_histogram = report['score_histogram']
 
-# Slider for selecting score range
-min_score, max_score = st.slider('Select Score Range:', float(df['Score'].min()), float(df['Score'].max()), (1.85, 9.0))
-filtered_data = df[df['Score'].between(min_score, max_score)]
+    # Slider for selecting score range
+    min_score, max_score = st.slider('Select Score Range:', float(score_histogram.low), float(score_histogram.high), (1.85, 9.0))
 
-# Plotting the distribution of scores
-plt.figure(figsize=(10, 4))
-sns.histplot(filtered_data['Score'], bins=30, kde=True, color='#7F7FFF')
-plt.title('Score Distribution')
-plt.xlabel('Score')
-plt.ylabel('Frequency')
-st.pyplot(plt)
+    # Plotting the distribution of scores
+    st.plotly_chart(figures.plot_score_histogram(report, min_score, max_score), use_container_width=True)
 
-st.markdown("""
+    st.markdown("""
 ### Score Distribution Analysis
 - The distribution of anime scores shows a roughly bell-shaped curve, indicating a normal distribution.
 - Most scores are clustered around the **mean of 6.51**, with fewer titles receiving extremely high or low scores.
 - This suggests a general consistency in the scoring of anime titles.
 """)
 
-# TRENDS
-
-def load_data_1():
-    df = pd.read_csv('anime.csv')
-    df['Score'] = pd.to_numeric(df['Score'], errors='coerce')
-    df['Year'] = pd.to_datetime(df['Aired'].str.extract(r'(\d{4})')[0], errors='coerce').dt.year
-    df['Genres'] = df['Genres'].fillna('').apply(lambda x: x.split(', '))
-    df.dropna(subset=['Score', 'Year'], inplace=True)
-    return df
-
-df = load_data_1()
+    # TRENDS
 
-# Average Score Trend Over Years
-st.markdown("""
+    # Average Score Trend Over Years
+    st.markdown("""
         ### Average Score Trend Over Year
          A line chart showing the average score per year is displayed. This helps in understanding how anime scores have evolved over time.
          """)
-avg_score_by_year = df.groupby('Year')['Score'].mean().dropna()
-st.line_chart(avg_score_by_year)
-
-
+    avg_score_by_year = report['score_trend']
+    st.line_chart(avg_score_by_year)
 
 
 #---------GENRE ANALYSIS IN ANIME-------------
 
-st.title('Genre Analysis in Anime')
+@fragment
+def genre_analysis_section():
+    st.title('Genre Analysis in Anime')
 
-st.markdown("""
+    st.markdown("""
 - **This will involve extracting genres from each title**, counting their occurrences, and visualizing the frequency of each genre.
 """)
 
+    # Selecting a number of top genres to display
+    top_n = st.slider('Number of Top Genres to Display:', min_value=5, max_value=30, value=10)
 
-df = load_data() 
+    # Plotting the top genres
+    show_chart('top-genres', top_n=top_n)
 
-# Extracting genres
-df['Genres'] = df['Genres'].fillna('Unknown')
-all_genres = df['Genres'].str.split(', ').sum()
-genre_counts = Counter(all_genres)
-
-# Selecting a number of top genres to display
-top_n = st.slider('Number of Top Genres to Display:', min_value=5, max_value=30, value=10)
-top_genres = dict(genre_counts.most_common(top_n))
-
-# Plotting the top genres
-plt.figure(figsize=(12, 6))
-sns.barplot(x=list(top_genres.values()), y=list(top_genres.keys()))
-plt.title(f'Top {top_n} Genres in Anime')
-plt.xlabel('Frequency')
-plt.ylabel('Genres')
-st.pyplot(plt)
-
-st.markdown("""
+    st.markdown("""
 - **The bar plot illustrates the frequency of different anime genres in the dataset.**
 - **Comedy** is the most common type of anime, with 6029 shows, showing that a lot of anime fans like it. 
 - **Action** is the second most common, with 3888 shows, meaning many viewers enjoy exciting and action-packed anime. 
@@ -202,32 +290,22 @@ st.markdown("""
 """)
 
 
-
 #-------ANIME TYPES DISTRIBUTION------------
 
-st.title('Anime Types Distribution')
+@fragment
+def types_section():
+    st.title('Anime Types Distribution')
 
-st.markdown("""
+    st.markdown("""
 - **Here, we will explore the distribution of various anime formats, including TV series, movies, and more.**
 - **This analysis aims to understand the composition of the dataset in terms of anime formats.** It will provide insights into which formats are more commonly represented and potentially indicate trends in anime production.
 - **By exploring this aspect, we'll gain a clearer picture of the anime landscape** as captured in the dataset.
 """)
 
+    # Plotting
+    show_chart('types')
 
-df = load_data()  
-
-# Counting the occurrences of each type
-type_counts = df['Type'].value_counts()
-
-# Plotting 
-plt.figure(figsize=(10, 6))
-sns.barplot(x=type_counts.index, y=type_counts.values)
-plt.title('Distribution of Different Types of Anime')
-plt.xlabel('Type')
-plt.ylabel('Frequency')
-st.pyplot(plt)
-
-st.markdown("""
+    st.markdown("""
 - **The bar plot above reveals how different types of anime, like TV series and movies, are distributed.**
 - **This visualization is key to understanding the diversity of anime production and consumption.** It highlights not just the popular formats, but also the niche ones that contribute to the rich tapestry of anime culture.
 - **By examining these patterns, we gain insight into the evolving trends and preferences in the anime industry.**
@@ -236,36 +314,17 @@ st.markdown("""
 
 #--------EPISODE COUNT ANALYSIS IN ANIME------------
 
-st.title('Episode Count Analysis in Anime')
+@fragment
+def episodes_section():
+    st.title('Episode Count Analysis in Anime')
 
-st.markdown("""
+    st.markdown("""
 - **Let's take a closer look into the range of episode counts across the dataset.**
 - This analysis help us figure out how long most anime shows are. We want to know how many episodes are usual for different kinds of anime. By looking at this, we can learn more about how anime stories are told and made.
 """)
 
-# Converting 'Episodes' to numeric
-df['Episodes'] = pd.to_numeric(df['Episodes'], errors='coerce')
-
-
-@st.cache_data
-def load_data():
-    data = pd.read_csv('anime.csv')  
-    data['Episodes'] = pd.to_numeric(data['Episodes'], errors='coerce')
-    return data
-
-data = load_data()
-
-def display_episode_stats(data):
     # Descriptive statistics for the Episodes column
-    episode_stats = data['Episodes'].describe()
-
-    # Count of missing values in the Episodes column
-    missing_episodes = data['Episodes'].isna().sum()
-
-    return episode_stats, missing_episodes
-
-def main():
-    episode_stats, missing_episodes = display_episode_stats(data)
+    episode_stats = report['episode_stats']['stats']
 
     st.subheader("Descriptive Statistics for the Episodes Column")
 
@@ -273,13 +332,8 @@ def main():
     episode_stats_df = pd.DataFrame(episode_stats).transpose()
 
     st.table(episode_stats_df)
-    
-if __name__ == "__main__":
-    main()
-
 
-
-st.markdown("""
+    st.markdown("""
 ### Episode Count Distribution in Anime
 - **Count**: There are 17,046 anime titles with numeric episode counts in our dataset.
 - **Mean**: On average, an anime has about 11.53 episodes, indicating a trend towards shorter series.
@@ -290,46 +344,31 @@ st.markdown("""
 - **Histogram Insights**: The histogram, which you can view below, illustrates a heavy concentration of anime with a small number of episodes. This trend sharply declines for longer series, echoing the industry norm where many series are brief, while a few are exceptionally long-running.
 """)
 
+    episode_histogram = report['episode_histogram']
 
-# Slider for selecting episode range
-min_episodes, max_episodes = st.slider('Select Episode Range:', int(df['Episodes'].min()), int(df['Episodes'].max()), (1, 100))
-filtered_episodes = df[df['Episodes'].between(min_episodes, max_episodes)]
+    # Slider for selecting episode range
+    min_episodes, max_episodes = st.slider('Select Episode Range:', int(episode_histogram.low), int(episode_histogram.high), (1, 100))
 
-# Plotting the distribution of episodes
-plt.figure(figsize=(10, 4))
-sns.histplot(filtered_episodes['Episodes'], bins=30, kde=False)
-plt.title('Episode Distribution')
-plt.xlabel('Number of Episodes')
-plt.ylabel('Frequency')
-st.pyplot(plt)
+    # Plotting the distribution of episodes
+    st.plotly_chart(figures.plot_episode_histogram(report, min_episodes, max_episodes), use_container_width=True)
 
 
 #------------TRENDS IN ANIME AIRING AND PREMIERING----------------
 
-st.title('Trends in Anime Airing and Premiering')
+@fragment
+def airing_trends_section():
+    st.title('Trends in Anime Airing and Premiering')
 
-st.markdown(""" 
+    st.markdown("""
 - **This involves analysis of the 'Aired' and 'Premiered' columns** in our dataset, which will reveal how anime release patterns have evolved over time.
 - **By exploring these trends**, we aim to understand not only the frequency of anime productions but also identify any significant changes or developments in the industry across different periods.
 - **This analysis is crucial for grasping the historical context** and the current state of anime production, potentially offering insights into future trends.
 """)
 
-# Extracting year from 'Aired' column
-df['Aired Year'] = df['Aired'].str.extract(r'(\d{4})')
-df['Aired Year'] = pd.to_numeric(df['Aired Year'], errors='coerce')
-
-# Grouping data by aired year and calculating the count
-yearly_counts = df['Aired Year'].value_counts().sort_index()
+    # Plotting
+    show_chart('airing')
 
-# Plotting
-plt.figure(figsize=(15, 6))
-sns.lineplot(x=yearly_counts.index, y=yearly_counts.values)
-plt.title('Trend of Anime Airing Over Years')
-plt.xlabel('Year')
-plt.ylabel('Number of Anime')
-st.pyplot(plt)
-
-st.markdown("""
+    st.markdown("""
 ### Trend of Anime Premiering Over the Years
 - **The line plot above provides a visual journey through the history of anime premieres year by year.**
 - There's a noticeable general increase in the number of anime premiering each year, with a significant uptick starting from the early 2000s. This trend mirrors the anime industry's expansion and its escalating popularity across the globe.
@@ -337,36 +376,24 @@ st.markdown("""
 - **Overall**, this visualization offers a compelling narrative of the anime industry's growth and its evolving landscape.
 """)
 
+    # Seasons
+    st.subheader('Premiere Seasons')
+    st.write("Titles premiering in each season of the year, with their average score, members and airing days. "
+             "Titles without a premiere season, like movies, count in the season of their first airing date.")
+    st.dataframe(report['season_stats'].style.format(precision=2, thousands=','))
+    st.line_chart(pd.DataFrame(report['season_trends']))
 
-#-----------POPULARITY TRENDS IN ANIME OVER TIME------------
-
-st.title('Popularity Trends in Anime Over Time')
-
-df['Popularity'] = pd.to_numeric(df['Popularity'], errors='coerce')
-
-popularity_trends = df.groupby('Aired Year')['Popularity'].mean().dropna().reset_index()
 
-fig = px.line(popularity_trends, x='Aired Year', y='Popularity', 
-              title='Average Anime Popularity Trends Over Years',
-              labels={'Popularity': 'Average Popularity', 'Aired Year': 'Year'},
-              markers=True)
-
-fig.update_traces(line=dict(color='Turquoise', width=3), 
-                  marker=dict(color='DarkSlateBlue', size=6, line=dict(color='MediumPurple', width=2)))
-
-fig.update_traces(hovertemplate='Year: %{x}<br>Popularity: %{y:.2f}')
-
-fig.update_xaxes(title_text='Year', tickangle=-45, gridcolor='LightGrey')
-
-# Inverting y-axis as lower numbers indicate higher popularity
-fig.update_yaxes(title_text='Average Popularity', autorange='reversed', gridcolor='LightGrey')
+#-----------POPULARITY TRENDS IN ANIME OVER TIME------------
 
-fig.update_layout(autosize=True)
+@fragment
+def popularity_trends_section():
+    st.title('Popularity Trends in Anime Over Time')
 
-st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(figures.plot_popularity_trend(report), use_container_width=True)
 
 
-st.markdown("""
+    st.markdown("""
 The line graph above shows the trend of anime popularity over the years, based on the average number of members per anime title. This visualization represents how the average interest in anime has evolved over time.
 - **Insights**:
     - There is a noticeable upward trend in the average number of members interested in anime titles, especially in more recent years.
@@ -376,83 +403,38 @@ The line graph above shows the trend of anime popularity over the years, based o
 - This analysis, therefore, provides a clear indication of the growing appeal of anime across a wider audience, making it a valuable insight for content creators, marketers, and platforms involved in the anime industry. ​​            
 """)
 
-# ANIME TYPE POPULARITY TREND
-
-
-def load_data_2():
-    df = pd.read_csv('anime.csv')
-    df['Year'] = pd.to_datetime(df['Aired'].str.extract(r'(\d{4})')[0], errors='coerce').dt.year
-    return df
+    # ANIME TYPE POPULARITY TREND
 
-df = load_data_2()
-
-st.markdown("""
+    st.markdown("""
             ### Anime Type Popularity Trend
             This visualizes how the popularity of different types of anime (TV, Movie, OVA, etc.) has changed over the years. Users can select an anime type from a dropdown menu.
     """)
 
-# User input for selecting anime type
-selected_type = st.selectbox('Select Type of Anime', df['Type'].unique(), key='type_select')
+    # User input for selecting anime type
+    selected_type = st.selectbox('Select Type of Anime', report['types'], key='type_select')
 
-# Filtering data based on selected type
-type_filtered_df = df[df['Type'] == selected_type].groupby('Year').size()
+    # Yearly titles of the selected type
+    type_filtered_df = report['type_trends'][selected_type]
 
-# Plotting
-st.write(f"Popularity Trend for Type: {selected_type}")
-st.line_chart(type_filtered_df)
+    # Plotting
+    st.write(f"Popularity Trend for Type: {selected_type}")
+    st.line_chart(type_filtered_df)
 
 
 #---------FAVORITE GENRES ANALYSIS--------------
 
+@fragment
+def favorite_genres_section():
+    st.title('Favorite Genres')
 
-st.title('Favorite Genres')
-
-def split_genres(row):
-    if pd.notna(row['Genres']):
-        return row['Genres'].split(', ')
-    else:
-        return []
-
-def load_data():
-    anime_data = pd.read_csv('anime.csv')  
-    anime_data['Genre List'] = anime_data.apply(split_genres, axis=1)
-    exploded_genres = anime_data.explode('Genre List')
-    genre_favorites = exploded_genres.groupby('Genre List')['Favorites'].sum().sort_values(ascending=False)
-    return genre_favorites
-
-def plot_genres(genre_favorites, max_genres):
-
-    selected_genres = genre_favorites.head(max_genres).reset_index()
-    selected_genres.columns = ['Genre', 'Total Favorites']
-
-    fig = px.bar(selected_genres, x='Total Favorites', y='Genre', orientation='h', 
-                 title='Top 10 Favorite Genres', 
-                 labels={'Total Favorites': 'Total Favorites', 'Genre': 'Genre'},
-                 text='Total Favorites',
-                 color='Genre',
-                 color_continuous_scale=px.colors.sequential.Viridis)
-    fig.update_layout(
-        yaxis={'categoryorder':'total ascending'},
-        plot_bgcolor='rgba(0,0,0,0)',  
-        paper_bgcolor='rgba(0,0,0,0)',      
-        title_font_size=22,      
-        title_font_family='Arial',
-    )
-    st.plotly_chart(fig)
-
-def main():
-
-    genre_favorites = load_data()
+    genre_favorites = report['genre_favorites']
 
     max_genres = st.slider('Select the number of genres to display', 10, 
                            len(genre_favorites), 10)
 
-    plot_genres(genre_favorites, max_genres)
+    st.plotly_chart(figures.plot_genre_favorites(genre_favorites, max_genres))
 
-if __name__ == "__main__":
-    main()
-
-st.markdown("""
+    st.markdown("""
 In the diverse world of anime, genres play a crucial role in defining the narrative and appeal of each series. This analysis delves into understanding which genres resonate the most with the audience. This will involve examining the 'Favorites' column in relation to the genres.
 ### Top 10 Most Popular Anime Genres
 
@@ -487,52 +469,37 @@ This shows us what types of stories and themes anime fans love the most. We foun
 
 """)
 
-# TREND
+    # TREND
 
-df = load_data_1()
-
-# Genre Popularity Trend
-st.header("Genre Popularity Trend")
-st.markdown("""
+    # Genre Popularity Trend
+    st.header("Genre Popularity Trend")
+    st.markdown("""
              The user can select a genre from a dropdown menu, and a line chart will display the number of anime produced in that genre each year.
              """)
-selected_genre = st.selectbox('Select a Genre', sorted(set(sum(df['Genres'], []))))
-genre_popularity = df[df['Genres'].apply(lambda x: selected_genre in x)].groupby('Year').size()
-st.line_chart(genre_popularity)
-
-
+    selected_genre = st.selectbox('Select a Genre', report['genres'])
+    genre_popularity = report['genre_trends'][selected_genre]
+    st.line_chart(genre_popularity)
 
 
 # -------- SCORE VS. POPULARITY ANALYSIS ---------------
 
-st.markdown("""
+@fragment
+def score_popularity_section():
+    st.markdown("""
             # Correlation between an anime's score and its popularity.
             For this analysis, we'll investigate the relationship between the score (which could be interpreted as a measure of quality or viewer appreciation) and the popularity of an anime.
             """)
 
-def load_data():
-    data = pd.read_csv("anime.csv")  
-    data['Score'] = pd.to_numeric(data['Score'], errors='coerce')
-    return data
-
-anime_data = load_data()
-
-score_popularity_data = anime_data[['Score', 'Members']].dropna()
-correlation = score_popularity_data.corr()
+    score_popularity = report['score_popularity']
 
-# Plotting 
-fig = px.scatter(score_popularity_data, x='Score', y='Members', 
-                 title='Correlation between Anime Score and Popularity',
-                 trendline='ols', trendline_color_override='red', opacity=0.5)
-fig.update_layout(xaxis_title='Score', yaxis_title='Number of Members',
-                  yaxis_type='log')  # log scale for Members due to wide range
+    # Plotting
+    st.plotly_chart(figures.plot_score_popularity(score_popularity))
+    st.caption(f"Showing {len(score_popularity['points']):,} of {score_popularity['rows']:,} titles")
 
-st.plotly_chart(fig)
+    correlation_display = score_popularity['correlation']
+    st.write(f"Correlation: {correlation_display:.2f}")
 
-correlation_display = correlation.iloc[0, 1]
-st.write(f"Correlation: {correlation_display:.2f}")
-
-st.markdown("""
+    st.markdown("""
 
 The scatter plot visualizes the relationship between anime scores and their popularity, measured by the number of members.
 
@@ -549,70 +516,44 @@ The scatter plot visualizes the relationship between anime scores and their popu
 - The analysis highlights a general trend where quality, as indicated by scores, is a factor in an anime's popularity. However, this relationship is influenced by various other factors, such as genre, marketing, and audience preferences.
             """)
 
-# Score Distribution by Genre Tool
-
-def load_data_3():
-    df = pd.read_csv('anime.csv')
-    df['Score'] = pd.to_numeric(df['Score'], errors='coerce')
-    df['Genres'] = df['Genres'].fillna('').apply(lambda x: x.split(', '))
-    df.dropna(subset=['Score'], inplace=True)
-    return df
 
-df = load_data_3()
+# Score Distribution by Genre Tool
 
-st.markdown("""
+@fragment
+def score_by_genre_section():
+    st.markdown("""
             ## Anime Score Distribution by Genre
             This analyzes and visualizes the distribution of anime scores across different genres, helping to understand which genres tend to have higher ratings. Users can select a genre from the dropdown menu. 
             """)
 
-# User input for selecting a genre
-selected_genre = st.selectbox('Select a Genre', sorted(set(sum(df['Genres'], []))), key='genre_select')
+    # User input for selecting a genre; genres without a rated title have no distribution
+    selected_genre = st.selectbox('Select a Genre', list(report['genre_scores']), key='genre_select')
 
-# Filtering data based on selected genre
-genre_filtered_df = df[df['Genres'].apply(lambda x: selected_genre in x)]
+    # Plotting
+    st.write(f"Score Distribution for Genre: {selected_genre}")
+    show_chart('score-by-genre', genre=selected_genre)
 
-# Plotting
-st.write(f"Score Distribution for Genre: {selected_genre}")
-plt.figure(figsize=(10, 6))
-sns.histplot(genre_filtered_df['Score'], kde=True)
-st.pyplot(plt)
 
 # -------- LONGEVITY ANALYSIS ---------------
 
-
-
-st.markdown("""
+@fragment
+def longevity_section():
+    st.markdown("""
             # Longevity Analysis
             In this analysis, we'll examine how the length of an anime (measured by the number of episodes) correlates with its overall score. This will give us insights into whether longer or shorter series tend to be rated higher by viewers.
             """)
 
+    episodes_score = report['episodes_score']
 
-def load_data():
-    data = pd.read_csv("anime.csv") 
-    data['Score'] = pd.to_numeric(data['Score'], errors='coerce')
-    data['Episodes'] = pd.to_numeric(data['Episodes'], errors='coerce')
-    return data
-
-anime_data = load_data()
-
-episodes_score_data = anime_data[['Episodes', 'Score']].dropna()
-
-# Calculating the correlation
-episodes_score_correlation = episodes_score_data.corr()
+    # Plotting using plotly
+    st.plotly_chart(figures.plot_episodes_score(episodes_score))
+    st.caption(f"Showing {len(episodes_score['points']):,} of {episodes_score['rows']:,} titles")
 
-# Plotting using plotly
-fig = px.scatter(episodes_score_data, x='Episodes', y='Score', 
-                 title='Correlation between Number of Episodes and Anime Score',
-                 log_x=True, opacity=0.5)
-fig.update_layout(xaxis_title='Number of Episodes (log scale)', yaxis_title='Score')
+    # Display the correlation value
+    episodes_score_correlation_display = episodes_score['correlation']
+    st.write(f"Correlation: {episodes_score_correlation_display:.2f}")
 
-st.plotly_chart(fig)
-
-# Display the correlation value
-episodes_score_correlation_display = episodes_score_correlation.iloc[0, 1]
-st.write(f"Correlation: {episodes_score_correlation_display:.2f}")
-
-st.markdown("""
+    st.markdown("""
 
 The scatter plot with a logarithmic scale on the x-axis (number of episodes) shows the relationship between the number of episodes and the anime score.
 
@@ -629,48 +570,20 @@ The scatter plot with a logarithmic scale on the x-axis (number of episodes) sho
 -  The analysis indicates that the length of an anime, in terms of episode count, does not significantly impact its score. Both short and long series can achieve high or low scores, underscoring the importance of content quality over quantity.
  """)
 
+
 # -------- GENRE AND TYPE CORRELATION ANALYSIS ---------------
 
-st.markdown("""
+@fragment
+def genre_type_section():
+    st.markdown("""
             # Genre and Type Correlation
              This analysis aims to explore the relationship between genres and the types of anime (such as TV series, movies, OVAs, etc.). We'll examine which genres are commonly associated with different types of anime, providing insights into industry trends and audience preferences.
             """)
 
-@st.cache_data
-def load_data():
-    anime_data = pd.read_csv('anime.csv')
-    return anime_data
-
-# Function to calculate genre type counts
-def get_genre_type_counts(anime_data):
-    unique_genres = list(set([genre for sublist in anime_data['Genres'].str.split(', ') for genre in sublist]))
-    unique_types = anime_data['Type'].unique()
-
-    genre_type_counts = pd.DataFrame(index=unique_genres, columns=unique_types)
-    genre_type_counts = genre_type_counts.fillna(0)
-
-    for _, row in anime_data.iterrows():
-        genres = row['Genres'].split(', ')
-        anime_type = row['Type']
-        for genre in genres:
-            genre_type_counts.at[genre, anime_type] += 1
+    # Plotting
+    show_chart('genre-type')
 
-    return genre_type_counts
-
-data = load_data()
-
-# Plotting
-genre_type_counts = get_genre_type_counts(data)
-plt.figure(figsize=(12, 10))
-sns.heatmap(genre_type_counts, annot=True, fmt="d", cmap="YlGnBu")
-plt.title("Occurrence of Anime Genres Across Different Types")
-plt.xlabel("Type of Anime")
-plt.ylabel("Genre")
-plt.xticks(rotation=45)
-plt.yticks(rotation=0)
-st.pyplot(plt)
-
-st.markdown("""
+    st.markdown("""
 
 This analysis focuses on the distribution of various genres across different types of anime, such as TV series, movies, OVAs, Specials, and ONAs.
 
@@ -705,36 +618,19 @@ This analysis focuses on the distribution of various genres across different typ
            """)
 
 
-
 # -------- MEMBER ENGAGEMENT ANALYSIS ---------------
 
-st.markdown("""
+@fragment
+def engagement_section():
+    st.markdown("""
             # Member Engagement
             In this analysis, we'll examine how members of the anime community engage with anime across different statuses: watching, completed, on-hold, dropped, and planning to watch. This will provide insights into viewing behaviors and preferences.
             """)
 
-def load_data():
-    data = pd.read_csv("anime.csv")  
-    return data
-
-anime_data = load_data()
-
-# Selecting relevant columns for member engagement analysis
-member_engagement_data = anime_data[['Watching', 'Completed', 'On-Hold', 'Dropped', 'Plan to Watch']]
+    # Plotting
+    st.plotly_chart(figures.plot_engagement(report['engagement']))
 
-# Summing up the counts for each category
-total_engagement = member_engagement_data.sum().reset_index()
-total_engagement.columns = ['Status', 'Number of Members']
-
-# Plotting 
-fig = px.bar(total_engagement, x='Status', y='Number of Members', color='Status',
-             labels={'Number of Members':'Number of Members'},
-             title='Member Engagement Across Different Anime Statuses')
-fig.update_layout(xaxis_title='Status', yaxis_title='Number of Members')
-
-st.plotly_chart(fig)
-
-st.markdown("""
+    st.markdown("""
 
 The bar plot illustrates the distribution of member engagement across different anime statuses, accompanied by the total counts in each category.
 
@@ -758,25 +654,31 @@ The member engagement analysis reveals significant insights into how viewers int
             """)
 
 
-
 # Anime Recommendation Tool
 
-@st.cache_data  
-def load_data():
-    df = pd.read_csv('anime.csv')
-    df['Score'] = pd.to_numeric(df['Score'], errors='coerce')  # Convert Score to numeric
-    df['Year'] = df['Aired'].str.extract(r'(\d{4})').astype(float)  # Extract year
-    return df
+# Filtering the dataset
+def filter_anime(df, genre_index, genres, rating, year_range, match_all=False, excluded=()):
+    mask = (df['Score'] >= rating) & df['Year'].between(year_range[0], year_range[1])
+    if match_all:
+        mask &= genre_index.mask(all_of=genres, none_of=excluded)
+    else:
+        mask &= genre_index.mask(any_of=genres, none_of=excluded)
+    return df[mask]
+
 
-df = load_data()
+@fragment
+def recommendation_section():
+    df = anime
+    genre_index = load_genre_index(anime, version)
 
-st.title('Anime Recommendation Tool')
+    st.title('Anime Recommendation Tool')
+
+    st.markdown(""" This tool allows users to explore and discover anime based on their personal preferences.   
 
-st.markdown(""" This tool allows users to explore and discover anime based on their personal preferences.   
-            
 - **Genre Selection**:
     - Users can select one or multiple genres from a dropdown menu.
     - This menu lists all unique genres extracted from the dataset.
+    - Users can choose whether an anime needs any or all of the selected genres, and exclude genres they don't want.
 - **Minimum Rating Selection**:
     - A slider allows users to choose a minimum rating for anime, ranging from 0.0 to 10.0.
     - The default value of this slider is set at 7.0.
@@ -789,106 +691,240 @@ st.markdown(""" This tool allows users to explore and discover anime based on th
     - If there are anime that match the user’s criteria, they will be displayed in a table, showing their names, genres, scores, and release years.
              """)
 
-unique_genres = set()
-for genres in df['Genres'].dropna().str.split(', '):
-    unique_genres.update(genres)
-unique_genres = sorted(unique_genres)
-
-# User Inputs
-selected_genres = st.multiselect('Select Genre(s)', options=unique_genres)
-selected_rating = st.slider('Select Minimum Rating', 0.0, 10.0, 7.0)
-year_min, year_max = int(df['Year'].min()), int(df['Year'].max())
-selected_year_range = st.slider('Select Year of Release Range', year_min, year_max, (year_min, year_max))
-
-# Filtering the dataset
-def filter_anime(df, genres, rating, year_range):
-    filtered_df = df[df['Score'] >= rating]
-    filtered_df = filtered_df[(filtered_df['Year'] >= year_range[0]) & (filtered_df['Year'] <= year_range[1])]
-    if genres:
-        mask = filtered_df['Genres'].apply(lambda x: x is not None and any(genre in x for genre in genres))
-        filtered_df = filtered_df[mask]
-    return filtered_df
-
-recommended_anime = filter_anime(df, selected_genres, selected_rating, selected_year_range)
-
-# Display recommendations
-st.write('Recommended Anime:')
-if not recommended_anime.empty:
-    st.dataframe(recommended_anime[['Name', 'Genres', 'Score', 'Year']].dropna())
-else:
-    st.write("No anime found matching the criteria. Please adjust your filters.")
-
-
-        
-        
-#----------- ANIME RATING PREDICTOR ----------------
-
-@st.cache_data
-def load_data():
-    df = pd.read_csv('anime.csv')
-    df['Score'] = pd.to_numeric(df['Score'], errors='coerce')
-    df['Year'] = pd.to_datetime(df['Aired'].str.extract(r'(\d{4})')[0], errors='coerce').dt.year
-    df['Episodes'] = pd.to_numeric(df['Episodes'], errors='coerce')
-    df['Genres'] = df['Genres'].fillna('').apply(lambda x: x.split(', '))
-    df['Studios'] = df['Studios'].fillna('Unknown')
-    df.dropna(subset=['Score', 'Year', 'Episodes', 'Studios'], inplace=True)
-    return df
-
-
-def process_input_data(df, year, episodes, genres, studio):
-    genre_encoded = mlb.transform([genres])
-    studio_encoded = le.transform([studio])[0] if studio else 0
-    input_data = np.concatenate(([year, episodes, studio_encoded], genre_encoded[0]))
-    return input_data
-
-
-df = load_data()
-
-# Genre encoding
-mlb = MultiLabelBinarizer()
-genre_encoded = mlb.fit_transform(df['Genres'])
-genre_encoded_df = pd.DataFrame(genre_encoded, columns=mlb.classes_, index=df.index)
-
-le = LabelEncoder()
-df['Studio_encoded'] = le.fit_transform(df['Studios'])
-
-X = pd.concat([df[['Year', 'Episodes', 'Studio_encoded']], genre_encoded_df], axis=1, join='inner')
-y = df['Score']
+    unique_genres = genre_index.genres
 
-# Splitting the data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=0)
+    # User Inputs
+    selected_genres = st.multiselect('Select Genre(s)', options=unique_genres)
+    genre_match = st.radio('Match', ['Any selected genre', 'All selected genres'], horizontal=True)
+    excluded_genres = st.multiselect('Exclude Genre(s)', options=unique_genres)
+    selected_rating = st.slider('Select Minimum Rating', 0.0, 10.0, 7.0)
+    year_min, year_max = int(df['Year'].min()), int(df['Year'].max())
+    selected_year_range = st.slider('Select Year of Release Range', year_min, year_max, (year_min, year_max))
 
-# Training model
-model = RandomForestRegressor()
-model.fit(X_train, y_train)
-
-st.title('Anime Rating Predictor')
-
-# User inputs for prediction
-st.write("Predict the score of an anime based on its year, number of episodes, genres, and optionally studio")
-input_year = st.number_input('Year of Release', min_value=int(X['Year'].min()), max_value=int(X['Year'].max()), value=2020)
-input_episodes = st.number_input('Number of Episodes', min_value=1, max_value=1000, value=12)
-input_genres = st.multiselect('Select Genres', options=mlb.classes_)
-input_studio = st.selectbox('Select Studio (Optional)', options=[''] + list(le.classes_), index=0)
-
-# Predicting the score
-if st.button('Predict Score'):
-    input_data = process_input_data(df, input_year, input_episodes, input_genres, input_studio)
-    predicted_score = model.predict([input_data])
-    st.write(f'Predicted Anime Score: {predicted_score[0]:.2f}')
-
-
-lottie_coding = load_lottieurl("https://lottie.host/ea036356-04bf-41cc-8983-7cc9cb4e3083/3hPzbrsPuU.json")
-
-st_lottie(lottie_coding, height = 350, key="anime")
+    recommended_anime = filter_anime(df, genre_index, selected_genres, selected_rating, selected_year_range,
+                                     match_all=genre_match == 'All selected genres', excluded=excluded_genres)
 
+    # Display recommendations
+    st.write('Recommended Anime:')
+    if not recommended_anime.empty:
+        st.dataframe(recommended_anime[['Name', 'Genres', 'Score', 'Year']].dropna())
+    else:
+        st.write("No anime found matching the criteria. Please adjust your filters.")
 
+    # More like this
+    st.subheader('More Like This')
+    st.write("Pick an anime to find the titles closest to it in genres, type, studio, score, episode count and year.")
 
+    similarity_index = load_similarity_index(anime, version)
 
+    # The picker offers the best matches of a title search, or the most popular titles, so
+    # it stays small however large the catalog is
+    names, popular = load_title_names(anime, version)
+    query = st.text_input('Search Titles', key='similar_query', placeholder='e.g. Fullmetal Alchemist')
+    titles = load_title_index(anime, version).search(query, PICKER_TITLES)[0] if query.strip() else popular
+    if not len(titles):
+        st.write("No titles match this search.")
+        return
+    selected_title = st.selectbox('Find Titles Like', titles.tolist(), format_func=names.__getitem__)
+    top_k = st.slider('Number of Similar Titles', 5, 50, 10)
 
+    positions, similarity = similarity_index.similar(selected_title, top_k)
+    similar_anime = df.iloc[positions][['Name', 'Genres', 'Type', 'Studios', 'Score', 'Episodes', 'Year']]
+    st.dataframe(similar_anime.assign(Similarity=similarity.round(3)), hide_index=True)
 
 
+#----------- ANIME RATING PREDICTOR ----------------
 
+ESTIMATOR_LABELS = {
+    'random-forest': 'Random forest',
+    'gradient-boosting': 'Histogram gradient boosting',
+    'linear': 'Linear (ridge)',
+}
+
+# Seconds between checks on a model still training
+TRAINING_POLL = 1
+
+@fragment
+def rating_predictor_section():
+    st.title('Anime Rating Predictor')
+
+    estimator = st.selectbox('Model', list(rating_model.ESTIMATORS), format_func=ESTIMATOR_LABELS.get)
+    job = training_job(estimator)
+    if not job.done:
+        st.progress(job.progress, text=f'Training the model: {job.stage}')
+        # Polled until training ends. Without scoped reruns this reruns the whole script, for
+        # every viewer of this section, each TRAINING_POLL seconds.
+        time.sleep(TRAINING_POLL)
+        rerun_section()
+    if job.error is not None:
+        st.error(f'Training the model failed: {job.error}')
+        if st.button('Retry Training'):
+            attempts = training_attempts()
+            attempts[version, estimator] = attempts.get((version, estimator), 0) + 1
+            rerun_section()
+        return
+    model = job.model
+
+    # User inputs for prediction
+    st.write("Predict the score of an anime based on its year, number of episodes, genres, and optionally studio")
+    year_min, year_max = model.year_range
+    input_year = st.number_input('Year of Release', min_value=year_min, max_value=year_max, value=min(2020, year_max))
+    input_episodes = st.number_input('Number of Episodes', min_value=1, max_value=1000, value=12)
+    input_genres = st.multiselect('Select Genres', options=model.genres)
+    input_studio = st.selectbox('Select Studio (Optional)', options=[''] + model.studios, index=0)
+
+    # Predicting the score
+    if st.button('Predict Score'):
+        predicted_score = model.predict_one(input_year, input_episodes, input_genres, input_studio)
+        st.write(f'Predicted Anime Score: {predicted_score:.2f}')
+
+    st.caption(f"Held-out error on {model.metrics['Test rows']} titles: "
+               f"MAE {model.metrics['MAE']:.2f}, RMSE {model.metrics['RMSE']:.2f}, R² {model.metrics['R2']:.2f}")
+
+    # Batch prediction
+    st.subheader('Score Many Titles')
+    st.write("Upload a CSV with `Year`, `Episodes`, `Genres` (comma-separated, as in the dataset) and "
+             "optionally `Studios` columns to predict every title at once.")
+    uploaded = st.file_uploader('Candidate Titles (CSV)', type='csv')
+    if uploaded is not None:
+        try:
+            scored = model.predict_frame(pd.read_csv(uploaded))
+        except (ValueError, pd.errors.ParserError) as e:
+            st.error(f'Could not score this file: {e}')
+            return
+
+        unknown = (scored['Unknown genres'] != '') | scored['Unknown studio']
+        if unknown.any():
+            st.warning(f'{unknown.sum():,} titles have genres or a studio the model has not seen; '
+                       'unseen genres were left out of their predictions and unseen studios '
+                       'predicted like a title without a studio.')
+        st.dataframe(scored, hide_index=True)
+        st.download_button('Download Predictions', scored.to_csv(index=False).encode(),
+                           file_name='predicted_scores.csv', mime='text/csv')
+
+
+#----------- TITLE SEARCH ----------------
+
+SEARCH_RESULTS = 20
+
+SCORE_VOTES = [f'Score-{score}' for score in range(10, 0, -1)]
+
+
+def show_value(value, format='{}'):
+    return '–' if pd.isna(value) or value == 'Unknown' else format.format(value)
+
+
+# Everything known about one title, with the titles most like it
+def title_detail(position):
+    title = anime.iloc[position]
+    st.header(title['Name'])
+    st.caption(' · '.join(show_value(title[column]) for column in ['English name', 'Japanese name']))
+
+    metrics = st.columns(4)
+    metrics[0].metric('Score', show_value(title['Score'], '{:.2f}'))
+    metrics[1].metric('Ranked', show_value(title['Ranked'], '#{:,.0f}'))
+    metrics[2].metric('Popularity', show_value(title['Popularity'], '#{:,.0f}'))
+    metrics[3].metric('Members', show_value(title['Members'], '{:,.0f}'))
+
+    season = f"{title['Season']} {title['Season Year']:.0f}" if pd.notna(title['Season']) else None
+    details = {
+        'Type': show_value(title['Type']),
+        'Episodes': show_value(title['Episodes'], '{:,.0f}'),
+        'Aired': show_value(title['Aired']),
+        'Airing Days': show_value(title['Airing Days'], '{:,.0f}'),
+        'Season': show_value(season),
+        'Genres': show_value(title['Genres']),
+        'Studios': show_value(title['Studios']),
+        'Source': show_value(title['Source']),
+        'Duration': show_value(title['Duration']),
+        'Rating': show_value(title['Rating']),
+    }
+    st.table(pd.DataFrame({'': details}))
+
+    st.subheader('Score Votes')
+    st.bar_chart(pd.Series(title[SCORE_VOTES].to_numpy(dtype=float), index=SCORE_VOTES, name='Votes'))
+
+    st.subheader('More Like This')
+    positions, similarity = load_similarity_index(anime, version).similar(position, 5)
+    similar_anime = anime.iloc[positions][['Name', 'Type', 'Score', 'Year']]
+    st.dataframe(similar_anime.assign(Similarity=similarity.round(3)), hide_index=True)
+
+
+@fragment
+def title_search_section():
+    st.title('Title Search')
+    st.write("Find a title by its name, English name or Japanese name. Close spellings and partial names match too.")
+
+    query = st.text_input('Search Titles', placeholder='e.g. Fullmetal Alchemist')
+    if not query.strip():
+        return
+
+    positions, scores = load_title_index(anime, version).search(query, SEARCH_RESULTS)
+    if not len(positions):
+        st.write("No titles match this search.")
+        return
+
+    matches = anime.iloc[positions][['Name', 'English name', 'Type', 'Year', 'Score']]
+    st.dataframe(matches.assign(Match=scores.round(2)), hide_index=True)
+
+    names, _ = load_title_names(anime, version)
+    selected = st.selectbox('Open Title', positions.tolist(), format_func=names.__getitem__)
+    title_detail(selected)
+
+
+#---------SECTIONS-------------
+
+
+# Query parameter value -> (sidebar label, section). Only the selected section runs.
+SECTIONS = {
+    'overview': ('Overview', overview_section),
+    'scores': ('Distribution of Anime Scores', score_distribution_section),
+    'genres': ('Genre Analysis', genre_analysis_section),
+    'types': ('Anime Types Distribution', types_section),
+    'episodes': ('Episode Count Analysis', episodes_section),
+    'airing': ('Trends in Airing and Premiering', airing_trends_section),
+    'popularity': ('Popularity Trends', popularity_trends_section),
+    'favorites': ('Favorite Genres', favorite_genres_section),
+    'score-popularity': ('Score vs. Popularity', score_popularity_section),
+    'score-by-genre': ('Score Distribution by Genre', score_by_genre_section),
+    'longevity': ('Longevity Analysis', longevity_section),
+    'genre-type': ('Genre and Type Correlation', genre_type_section),
+    'engagement': ('Member Engagement', engagement_section),
+    'search': ('Title Search', title_search_section),
+    'recommendations': ('Anime Recommendation Tool', recommendation_section),
+    'predictor': ('Anime Rating Predictor', rating_predictor_section),
+}
 
+# Sections that look up or score individual titles need the full frame
+if streaming.ENABLED:
+    del SECTIONS['search'], SECTIONS['recommendations'], SECTIONS['predictor']
 
+# A shared or bookmarked ?section= link picks the first section shown; afterwards the sidebar
+# keeps the URL in step so the current view can be shared
+if 'section' not in st.session_state:
+    requested_section = get_query_section()
+    st.session_state['section'] = requested_section if requested_section in SECTIONS else 'overview'
 
+selected_section = st.sidebar.radio('Analysis', list(SECTIONS), key='section',
+                                    format_func=lambda key: SECTIONS[key][0])
+set_query_section(selected_section)
+
+with profiler.measure(selected_section):
+    SECTIONS[selected_section][1]()
+
+
+lottie_coding = assets.load_animation(assets.LOTTIE_URLS['anime'])
+
+if lottie_coding:
+    st_lottie(lottie_coding, height = 350, key="anime")
+
+
+#---------PROFILER-------------
+
+profile = profiler.finish_run(selected_section)
+
+if profile is not None:
+    with st.sidebar.expander('Profiler', expanded=True):
+        st.dataframe(profile.table().round(1), hide_index=True, use_container_width=True)
+        if profiler.LOG_PATH:
+            st.caption(f'Appending to {profiler.LOG_PATH}')
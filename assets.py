@@ -0,0 +1,105 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+
+import requests
+
+import dataset
+import storage
+
+# Lottie animations of the app, kept with the other caches. Files are named by the SHA-256
+# of their content and index.json maps each source URL to its file. Hosts without network
+# access get the store filled by `python assets.py` or warmup.py at build time.
+LOTTIE_STORE = os.path.join(dataset.CACHE_DIR, 'lottie')
+
+LOTTIE_URLS = {
+    'coding': "https://lottie.host/5ae5c403-6777-4ddc-9d4b-69b991f2244e/SrRQPFgsnv.json",
+    'anime': "https://lottie.host/ea036356-04bf-41cc-8983-7cc9cb4e3083/3hPzbrsPuU.json",
+}
+
+# Seconds allowed for a single download
+FETCH_TIMEOUT = 5
+
+# Set LOTTIE_REFRESH=0 on hosts without network access to never try downloading
+REFRESH_ENABLED = os.environ.get('LOTTIE_REFRESH', '1') != '0'
+
+index_lock = threading.Lock()
+
+
+#---------LOCAL STORE-------------
+
+def read_index(store=LOTTIE_STORE):
+    try:
+        with open(os.path.join(store, 'index.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def store_animation(url, content, store=LOTTIE_STORE):
+    json.loads(content)  # refusing anything that isn't JSON
+    digest = hashlib.sha256(content).hexdigest()
+    storage.write_bytes(os.path.join(store, f'{digest}.json'), content)
+
+    with index_lock:
+        index = read_index(store)
+        index[url] = digest
+        storage.write_bytes(os.path.join(store, 'index.json'), json.dumps(index, indent=2, sort_keys=True).encode())
+    return digest
+
+
+# Animation for url from the local store, or None when it has not been stored yet
+def load_animation(url, store=LOTTIE_STORE):
+    digest = read_index(store).get(url)
+    if digest is None:
+        return None
+    try:
+        with open(os.path.join(store, f'{digest}.json'), 'rb') as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+#---------NETWORK REFRESH-------------
+
+def fetch_animation(url, store=LOTTIE_STORE, timeout=FETCH_TIMEOUT):
+    r = requests.get(url, timeout=timeout)
+    r.raise_for_status()
+    return store_animation(url, r.content, store)
+
+
+def fetch_missing(urls, store=LOTTIE_STORE, timeout=FETCH_TIMEOUT):
+    fetched = []
+    for url in urls:
+        if load_animation(url, store) is not None:
+            continue
+        try:
+            fetch_animation(url, store, timeout)
+            fetched.append(url)
+        except (requests.RequestException, ValueError, OSError):
+            # Offline or unreachable hosts just keep rendering without the animation
+            pass
+    return fetched
+
+
+# Downloads animations missing from the store on a daemon thread, so the network is never
+# on the render path. Animations appear on the next rerun once stored.
+def refresh_in_background(urls, store=LOTTIE_STORE, timeout=FETCH_TIMEOUT):
+    thread = threading.Thread(target=fetch_missing, args=(list(urls), store, timeout), daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Download the Lottie animations into the local store')
+    parser.add_argument('--store', default=LOTTIE_STORE)
+    parser.add_argument('--timeout', type=float, default=FETCH_TIMEOUT)
+    args = parser.parse_args()
+    for url in LOTTIE_URLS.values():
+        print(url, fetch_animation(url, args.store, args.timeout))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import sklearn
+
+import aggregates
+import analytics
+import dataset
+import rating_model
+import streaming
+import synthetic
+from genre_index import GenreIndex
+from title_index import TitleIndex
+
+# Generated catalogs and their caches, reused across runs with the same scale and seed
+DATA_DIR = os.path.join(dataset.CACHE_DIR, 'benchmark')
+
+SCALES = [1, 10, 100]
+
+# Single-title predictions timed together, as the predictor page makes them one at a time
+PREDICTIONS = 100
+
+# Title searches timed together, as typed into the search box: partial, misspelled and full names
+SEARCHES = ['tit', 'title 1', 'titel 12', 'Title 123', 'english 4', 'アニメ5']
+
+# Slowdown over the baseline that `compare` reports as a regression
+REGRESSION_THRESHOLD = 1.2
+
+
+#---------SECTIONS-------------
+
+# Each step gets the results of the steps before it, so it only times its own work
+
+def bench_load_csv(state):
+    return dataset.load_csv(state['csv'])
+
+
+def bench_build_cache(state):
+    return dataset.build_cache(state['csv'], state['cache_dir'])
+
+
+def bench_load_cache(state):
+    return dataset.read_cache(dataset.cache_path(state['csv'], state['cache_dir']))
+
+
+def bench_genre_index(state):
+    return GenreIndex(state['load_cache']['Genre List'])
+
+
+def bench_cube(state):
+    return aggregates.AggregateCube(state['load_cache'])
+
+
+# Genre and genre/type counts of the dashboard, read off the cube
+def bench_genre_counts(state):
+    return analytics.genre_counts(state['load_cache'], state['cube'])
+
+
+def bench_crosstab(state):
+    return analytics.genre_type_counts(state['load_cache'], state['cube'])
+
+
+# Every trend chart the app can show: overall, per type and per genre
+def bench_trends(state):
+    cube = state['cube']
+    charts = [cube.by_year('Score', 'mean'), cube.by_year('Score', 'count'), cube.by_year('Popularity', 'mean'),
+              cube.by_genre_total('Favorites'), cube.totals(aggregates.ENGAGEMENT_COLUMNS)]
+    charts += [cube.by_year('Titles', 'count', type=type) for type in cube.types]
+    charts += [cube.by_year('Score', 'count', genre=genre) for genre in state['genre_index'].genres]
+    return charts
+
+
+def bench_histograms(state):
+    anime = state['load_cache']
+    histograms = []
+    for column, low, high in [('Score', 1.85, 9.0), ('Episodes', 1, 100)]:
+        histogram = aggregates.Histogram(anime[column])
+        histograms.append((histogram.histogram(low, high), histogram.kde(low, high)))
+    return histograms
+
+
+def bench_scatter(state):
+    anime = state['load_cache']
+    return [aggregates.scatter_summary(anime, 'Score', 'Members', log_y=True),
+            aggregates.scatter_summary(anime, 'Episodes', 'Score', log_x=True)]
+
+
+# The recommendation tool's filter for a few typical genre selections
+def bench_recommendation(state):
+    anime, genre_index = state['load_cache'], state['genre_index']
+    base = (anime['Score'] >= 7.0) & anime['Year'].between(1990, 2020)
+    masks = [genre_index.mask(any_of=['Action']),
+             genre_index.mask(any_of=['Comedy', 'Romance'], none_of=['Kids']),
+             genre_index.mask(all_of=['Action', 'Comedy'])]
+    return [anime[base & mask] for mask in masks]
+
+
+# Every analysis of the dashboard, computed in this process
+def bench_report(state):
+    return analytics.build_report(state['load_cache'], state['cube'])
+
+
+# Every chart aggregate from a chunked read of the CSV, as the streaming mode computes them
+def bench_streaming(state):
+    return streaming.summarize_csv(state['csv'])
+
+
+def bench_title_index(state):
+    return TitleIndex(state['load_cache'])
+
+
+def bench_title_search(state):
+    return [state['title_index'].search(query) for query in SEARCHES]
+
+
+def bench_model_train(state):
+    return rating_model.RatingModel(state['params'], state['estimator']).fit(state['load_cache'])
+
+
+def bench_model_predict(state):
+    model = state['model_train']
+    genres = model.genres[:3]
+    return [model.predict_one(2020, 12, genres, model.studios[0]) for _ in range(PREDICTIONS)]
+
+
+SECTIONS = {
+    'load_csv': bench_load_csv,
+    'build_cache': bench_build_cache,
+    'load_cache': bench_load_cache,
+    'genre_index': bench_genre_index,
+    'cube': bench_cube,
+    'genre_counts': bench_genre_counts,
+    'crosstab': bench_crosstab,
+    'trends': bench_trends,
+    'histograms': bench_histograms,
+    'scatter': bench_scatter,
+    'recommendation': bench_recommendation,
+    'report': bench_report,
+    'streaming': bench_streaming,
+    'title_index': bench_title_index,
+    'title_search': bench_title_search,
+    'model_train': bench_model_train,
+    'model_predict': bench_model_predict,
+}
+
+# Steps whose results later steps need, run untimed when only their dependents are selected
+DEPENDENCIES = {
+    'load_cache': ['build_cache'],
+    'genre_index': ['load_cache'],
+    'genre_counts': ['cube'],
+    'crosstab': ['cube'],
+    'cube': ['load_cache'],
+    'trends': ['cube', 'genre_index'],
+    'histograms': ['load_cache'],
+    'scatter': ['load_cache'],
+    'recommendation': ['genre_index'],
+    'report': ['cube'],
+    'title_index': ['load_cache'],
+    'title_search': ['title_index'],
+    'model_train': ['load_cache'],
+    'model_predict': ['model_train'],
+}
+
+
+def required(sections):
+    needed = set()
+    pending = list(sections)
+    while pending:
+        section = pending.pop()
+        if section not in needed:
+            needed.add(section)
+            pending.extend(DEPENDENCIES.get(section, []))
+    return [section for section in SECTIONS if section in needed]
+
+
+#---------MEASUREMENT-------------
+
+# Wall and CPU time over `repeat` runs, plus the peak traced allocation of one more run.
+# Memory is traced separately because tracemalloc slows down allocation-heavy code.
+def measure(func, state, repeat=1):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    walls, cpus = [], []
+    for _ in range(repeat):
+        del result
+        gc.collect()
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = func(state)
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+
+    return result, {
+        'seconds': statistics.median(walls),
+        'min_seconds': min(walls),
+        'cpu_seconds': statistics.median(cpus),
+        'peak_mb': peak / 2 ** 20,
+    }
+
+
+def catalog_path(scale, seed, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f'anime-x{scale:g}-seed{seed}.csv')
+
+
+def run_scale(scale, sections, seed=0, repeat=1, params=None, data_dir=DATA_DIR, log=print,
+              estimator=rating_model.DEFAULT_ESTIMATOR):
+    csv = catalog_path(scale, seed, data_dir)
+    if not os.path.exists(csv):
+        log(f'generating {csv}')
+        synthetic.write_csv(csv, scale, seed)
+
+    state = {'csv': csv, 'cache_dir': data_dir, 'estimator': estimator,
+             'params': dict(params or rating_model.ESTIMATORS[estimator][1])}
+    rows = int(synthetic.BASE_ROWS * scale)
+    results = []
+    for section in required(sections):
+        if section in sections:
+            state[section], timings = measure(SECTIONS[section], state, repeat)
+            results.append(dict(scale=scale, rows=rows, section=section, **timings))
+            log(f'x{scale:g} {section:<15} {timings["seconds"]:9.3f}s {timings["peak_mb"]:9.1f} MB')
+        else:
+            state[section] = SECTIONS[section](state)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'pyarrow': pa.__version__,
+        'scikit-learn': sklearn.__version__,
+    }
+
+
+def run(scales=SCALES, sections=SECTIONS, seed=0, repeat=1, params=None, data_dir=DATA_DIR, log=print,
+        estimator=rating_model.DEFAULT_ESTIMATOR):
+    results = []
+    for scale in scales:
+        results += run_scale(scale, list(sections), seed, repeat, params, data_dir, log, estimator)
+    return {
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'settings': {'seed': seed, 'repeat': repeat, 'estimator': estimator,
+                     'params': dict(params or rating_model.ESTIMATORS[estimator][1])},
+        'results': results,
+    }
+
+
+#---------COMPARISON-------------
+
+# Sections timed in both reports, with the ratio of new to baseline time
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    before = {(r['scale'], r['section']): r for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        old = before.get((result['scale'], result['section']))
+        if old is None:
+            continue
+        ratio = result['seconds'] / old['seconds'] if old['seconds'] else float('inf')
+        rows.append({'scale': result['scale'], 'section': result['section'],
+                     'baseline_seconds': old['seconds'], 'seconds': result['seconds'], 'ratio': ratio,
+                     'baseline_peak_mb': old['peak_mb'], 'peak_mb': result['peak_mb'],
+                     'regression': ratio > threshold})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every analysis on synthetic catalogs')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='time each section and write the results as JSON')
+    run_parser.add_argument('--scales', type=float, nargs='+', default=SCALES)
+    run_parser.add_argument('--sections', nargs='+', choices=list(SECTIONS), default=list(SECTIONS))
+    run_parser.add_argument('--repeat', type=int, default=1)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--estimator', choices=list(rating_model.ESTIMATORS), default=rating_model.DEFAULT_ESTIMATOR)
+    run_parser.add_argument('--n-estimators', type=int, help='trees of the random forest')
+    run_parser.add_argument('--data-dir', default=DATA_DIR)
+    run_parser.add_argument('--output', help='file for the JSON results instead of stdout')
+
+    compare_parser = commands.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        params = dict(rating_model.ESTIMATORS[args.estimator][1])
+        if args.n_estimators is not None:
+            if args.estimator != 'random-forest':
+                parser.error('--n-estimators only applies to the random forest')
+            params['n_estimators'] = args.n_estimators
+        report = run(args.scales, args.sections, args.seed, args.repeat, params, args.data_dir,
+                     log=lambda line: print(line, file=sys.stderr), estimator=args.estimator)
+        output = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(output + '\n')
+        else:
+            print(output)
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    rows = compare(baseline, current, args.threshold)
+    for row in rows:
+        flag = '  REGRESSION' if row['regression'] else ''
+        print(f"x{row['scale']:g} {row['section']:<15} {row['baseline_seconds']:9.3f}s -> "
+              f"{row['seconds']:9.3f}s ({row['ratio']:.2f}x){flag}")
+    sys.exit(1 if any(row['regression'] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import storage
+import versions
+
+ANIME_CSV = versions.ANIME_CSV
+
+# Cleaned copies of the CSV in Arrow IPC format, one file per data version
+CACHE_DIR = versions.CACHE_DIR
+
+# Titles per chunk when reading the CSV in chunks; bounds the memory of a streaming read
+CHUNK_ROWS = 100000
+
+# Part of the cache file name; bumped whenever the cached columns or dtypes change
+CACHE_FORMAT = 3
+
+# Columns that are numbers in the dataset but come in as text because of 'Unknown' values
+NUMERIC_COLUMNS = ['Score', 'Episodes', 'Ranked', 'Popularity', 'Members', 'Favorites',
+                   'Watching', 'Completed', 'On-Hold', 'Dropped', 'Plan to Watch',
+                   'Score-10', 'Score-9', 'Score-8', 'Score-7', 'Score-6',
+                   'Score-5', 'Score-4', 'Score-3', 'Score-2', 'Score-1']
+
+# Text columns with few distinct values, stored as categoricals. Genres holds each distinct
+# genre combination once, and the rows' genre lists are shared per combination.
+CATEGORY_COLUMNS = ['Genres', 'Type', 'Studios', 'Producers', 'Licensors', 'Source',
+                    'Duration', 'Rating', 'Premiered']
+
+# Mostly distinct text, kept in one contiguous Arrow buffer per column instead of one
+# Python string per title
+TEXT_COLUMNS = ['Name', 'English name', 'Japanese name', 'Aired']
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# Seasons of the year in order, as in 'Premiered'; Winter starts in January
+SEASONS = ['Winter', 'Spring', 'Summer', 'Fall']
+
+# One date of 'Aired': 'Apr 3, 1998', 'Apr 1998' or '1998'
+DATE_PATTERN = r'(?:(?P<{0}_month>[A-Z][a-z]{{2}}) )?(?:(?P<{0}_day>\d{{1,2}}), )?(?P<{0}_year>\d{{4}})'
+
+# A date, or a range of dates ending in a date or in '?' while still airing
+AIRED_PATTERN = '^' + DATE_PATTERN.format('start') + r'(?P<range> to (?:' + DATE_PATTERN.format('end') + r'|\?))?$'
+
+PREMIERED_PATTERN = r'^(?P<season>' + '|'.join(SEASONS) + r') (?P<year>\d{4})$'
+
+
+#---------DATA VERSION-------------
+
+# Changes whenever anime.csv is replaced or edited, so caches keyed on it are refreshed
+data_version = versions.file_version
+
+
+#---------DATES-------------
+
+# Regex groups of every value of text, matched in one vectorized pass by Arrow's RE2 engine.
+# Values that don't match get no groups.
+def extract_groups(text, pattern):
+    return pc.extract_regex(pa.array(text, type=pa.string(), from_pandas=True), pattern)
+
+
+# One group of extract_groups; groups that took no part in the match are missing
+def group(parts, name):
+    values = pc.struct_field(parts, name)
+    return pc.if_else(pc.equal(values, ''), None, values)
+
+
+def group_numbers(parts, name):
+    return pc.cast(group(parts, name), pa.float64()).to_numpy(zero_copy_only=False)
+
+
+def group_months(parts, name):
+    months = pc.index_in(group(parts, name), value_set=pa.array(MONTHS))
+    return pc.cast(months, pa.float64()).to_numpy(zero_copy_only=False) + 1
+
+
+# Dates of a side's year, month and day groups, built with datetime64 arithmetic. A missing
+# month or day counts as the first; days past the end of their month, like Feb 30, give no date.
+def group_dates(parts, side):
+    year = group_numbers(parts, f'{side}_year')
+    month = np.nan_to_num(group_months(parts, f'{side}_month'), nan=1).astype(np.int64)
+    day = np.nan_to_num(group_numbers(parts, f'{side}_day'), nan=1).astype(np.int64)
+    valid = ~np.isnan(year)
+    months = (np.where(valid, year - 1970, 0).astype(np.int64) * 12 + month - 1).astype('datetime64[M]')
+    dates = months.astype('datetime64[D]') + (day - 1)
+    valid &= dates < (months + 1).astype('datetime64[D]')
+    return np.where(valid, dates, np.datetime64('NaT')).astype('datetime64[ns]')
+
+
+# Season code and year of every title, parsed once per distinct 'Premiered' value
+def parse_premiered(premiered):
+    values = pd.Categorical(premiered)
+    parts = extract_groups(pd.Series(values.categories, dtype=object), PREMIERED_PATTERN)
+    seasons = pc.index_in(group(parts, 'season'), value_set=pa.array(SEASONS))
+    # Code -1, a missing value, picks the appended missing season and year
+    seasons = np.append(pc.fill_null(seasons, -1).to_numpy(zero_copy_only=False), -1)
+    years = np.append(group_numbers(parts, 'year'), np.nan)
+    return seasons[values.codes], years[values.codes]
+
+
+# Typed dates of every title in one pass over 'Aired' and 'Premiered': start and end date,
+# days between them, start year, and the season the title premiered in. A single date ends
+# the day it starts, so it counts 0 airing days; a range ending in '?' has no end date yet. Titles without a 'Premiered'
+# season, like movies and OVAs, get the season of their start month.
+def parse_dates(data):
+    parts = extract_groups(data['Aired'], AIRED_PATTERN)
+    start = group_dates(parts, 'start')
+    ranged = pc.fill_null(pc.is_valid(group(parts, 'range')), False).to_numpy(zero_copy_only=False)
+    end = np.where(ranged, group_dates(parts, 'end'), start)
+
+    year = group_numbers(parts, 'start_year')
+    # Dates in any other format still give the first year they mention
+    unmatched = np.isnan(year) & data['Aired'].notna().to_numpy()
+    if unmatched.any():
+        year[unmatched] = group_numbers(extract_groups(data['Aired'][unmatched], r'(?P<year>\d{4})'), 'year')
+
+    month = group_months(parts, 'start_month')
+    seasons = np.where(np.isnan(month), -1, (np.nan_to_num(month) - 1) // 3).astype(np.int64)
+    season_years = np.where(seasons >= 0, year, np.nan)
+    if 'Premiered' in data:
+        premiered_seasons, premiered_years = parse_premiered(data['Premiered'])
+        premiered = premiered_seasons >= 0
+        seasons = np.where(premiered, premiered_seasons, seasons)
+        season_years = np.where(premiered, premiered_years, season_years)
+
+    return pd.DataFrame({
+        'Year': year,
+        'Aired From': start,
+        'Aired To': end,
+        'Airing Days': (end - start) / np.timedelta64(1, 'D'),
+        'Season': pd.Categorical.from_codes(seasons, categories=SEASONS, ordered=True),
+        'Season Year': season_years,
+    }, index=data.index)
+
+
+#---------CLEANING-------------
+
+def split_genres(genres):
+    # Missing genres become an empty list instead of NaN
+    lists = genres.str.split(', ')
+    return lists.apply(lambda x: x if isinstance(x, list) else [])
+
+
+# Genre tuple of every title, split once per distinct combination. Titles with the same
+# genres share one tuple.
+def genre_lists(genres):
+    genres = genres.astype('category')
+    lists = np.empty(len(genres.cat.categories) + 1, dtype=object)
+    # Every tuple refers to the same string object for a genre
+    names = {}
+    lists[:-1] = [tuple(names.setdefault(genre, genre) for genre in combination)
+                  for combination in split_genres(pd.Series(genres.cat.categories, dtype=object))]
+    lists[-1] = ()  # code -1, missing genres
+    return pd.Series(lists[genres.cat.codes.to_numpy()], index=genres.index)
+
+
+# Smallest type that holds every value unchanged: int32 for whole numbers without gaps
+# (kept at 32 bits so arithmetic on counts has headroom), float32 for whole numbers with
+# gaps, float64 for everything else.
+def downcast(column):
+    values = column.to_numpy()
+    present = values[~np.isnan(values)] if values.dtype.kind == 'f' else values
+    if len(present) and not np.array_equal(present, np.round(present)):
+        return column.astype(np.float64)
+    low, high = (present.min(), present.max()) if len(present) else (0, 0)
+    if len(present) < len(values):
+        return column.astype(np.float32) if max(abs(low), abs(high)) <= 2 ** 24 else column
+    int32 = np.iinfo(np.int32)
+    return column.astype(np.int32) if int32.min <= low and high <= int32.max else column
+
+
+def compact(data):
+    for column in CATEGORY_COLUMNS:
+        data[column] = data[column].astype('category')
+    for column in TEXT_COLUMNS:
+        data[column] = data[column].astype('string[pyarrow]')
+    for column in data.select_dtypes('number').columns:
+        data[column] = downcast(data[column])
+    return data
+
+
+def clean_anime(data, compact_dtypes=True):
+    for column in data.columns.intersection(NUMERIC_COLUMNS):
+        data[column] = pd.to_numeric(data[column], errors='coerce')
+
+    for column, values in parse_dates(data).items():
+        data[column] = values
+
+    if 'Studios' in data:
+        data['Studios'] = data['Studios'].fillna('Unknown')
+    if compact_dtypes:
+        data = compact(data)
+        data['Genre List'] = genre_lists(data['Genres'])
+    else:
+        data['Genre List'] = split_genres(data['Genres'])
+    return data
+
+
+def load_csv(path=ANIME_CSV, compact_dtypes=True):
+    return clean_anime(pd.read_csv(path), compact_dtypes)
+
+
+# Cleaned frames of up to chunk_rows titles each, reading only usecols. Their types are fixed
+# up front so every chunk comes out alike: numbers as float64 with 'Unknown' as missing and
+# the other columns as text. Chunks keep plain dtypes, as categories would differ from one
+# chunk to the next.
+def read_chunks(path=ANIME_CSV, usecols=None, chunk_rows=CHUNK_ROWS):
+    numeric = [column for column in NUMERIC_COLUMNS if usecols is None or column in usecols]
+    dtypes = {column: object for column in usecols or () if column not in numeric}
+    dtypes.update(dict.fromkeys(numeric, np.float64), MAL_ID=np.int64)
+    reader = pd.read_csv(path, usecols=usecols, dtype=dtypes, na_values=dict.fromkeys(numeric, ['Unknown']),
+                         chunksize=chunk_rows)
+    with reader:
+        for chunk in reader:
+            yield clean_anime(chunk, compact_dtypes=False)
+
+
+#---------MEMORY REPORT-------------
+
+# Bytes held by a column. Objects shared between rows, like the genre lists and the
+# strings pyarrow deduplicates, are counted once.
+def column_memory(column):
+    if column.dtype != object:
+        return int(column.memory_usage(deep=True, index=False))
+    total = int(column.memory_usage(deep=False, index=False))
+    seen = set()
+    pending = list(column.to_numpy())
+    while pending:
+        value = pending.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        total += sys.getsizeof(value)
+        if isinstance(value, (list, tuple)) or (isinstance(value, np.ndarray) and value.dtype == object):
+            pending.extend(value)
+    return total
+
+
+def memory_report(before, after):
+    report = pd.DataFrame({'before_mb': before.apply(column_memory), 'after_mb': after.apply(column_memory),
+                           'before_dtype': before.dtypes.astype(str), 'after_dtype': after.dtypes.astype(str)})
+    report[['before_mb', 'after_mb']] /= 2 ** 20
+    report.loc['Total', ['before_mb', 'after_mb']] = report[['before_mb', 'after_mb']].sum()
+    return report.sort_values('before_mb', ascending=False)
+
+
+#---------COLUMNAR CACHE-------------
+
+def cache_prefix(path, cache_dir):
+    return os.path.join(cache_dir, os.path.splitext(os.path.basename(path))[0])
+
+
+def cache_path(path=ANIME_CSV, cache_dir=CACHE_DIR):
+    return f'{cache_prefix(path, cache_dir)}-{data_version(path)}-v{CACHE_FORMAT}.arrow'
+
+
+def write_cache(anime, target):
+    # Genre lists are rebuilt from the Genres categories on load rather than stored per row
+    table = pa.Table.from_pandas(anime.drop(columns='Genre List'), preserve_index=False)
+
+    def write(temp):
+        with pa.OSFile(temp, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return storage.write_atomic(target, write)
+
+
+def build_cache(path=ANIME_CSV, cache_dir=CACHE_DIR):
+    target = write_cache(load_csv(path), cache_path(path, cache_dir))
+
+    # Dropping caches of older versions of the same CSV. Versions start with the file size,
+    # which leaves out the frames refresh.py stores next to them.
+    storage.drop_stale(f'{cache_prefix(path, cache_dir)}-[0-9]*.arrow', keep=[target])
+    return target
+
+
+def read_cache(target):
+    with pa.memory_map(target) as source:
+        # Plain string columns are the TEXT_COLUMNS; they stay in Arrow memory
+        anime = pa.ipc.open_file(source).read_all().to_pandas(
+            types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get)
+    anime['Genre List'] = genre_lists(anime['Genres'])
+    return anime
+
+
+def load_anime(path=ANIME_CSV, cache_dir=CACHE_DIR):
+    target = cache_path(path, cache_dir)
+    if not os.path.exists(target):
+        build_cache(path, cache_dir)
+    return read_cache(target)
+
+
+#---------READ-ONLY FRAME-------------
+
+# The same data on read-only arrays, for sharing one frame between sessions. Writing a
+# value into a numeric, categorical or genre column raises ValueError; Arrow-backed text
+# columns can't be locked this way, so they rely on callers not writing to them.
+def freeze(anime):
+    columns = {}
+    for name, column in anime.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            codes = column.cat.codes.to_numpy()
+            codes.flags.writeable = False
+            columns[name] = pd.Categorical.from_codes(codes, dtype=column.dtype)
+        elif isinstance(column.dtype, np.dtype):
+            values = column.to_numpy()
+            values.flags.writeable = False
+            columns[name] = values
+        else:
+            columns[name] = column.array
+    return pd.DataFrame(columns, index=anime.index, copy=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the columnar cache of the anime dataset')
+    parser.add_argument('csv', nargs='?', default=ANIME_CSV)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--memory-report', action='store_true',
+                        help='compare the memory of the plain and compact frames instead')
+    args = parser.parse_args()
+    if args.memory_report:
+        report = memory_report(load_csv(args.csv, compact_dtypes=False), load_anime(args.csv, args.cache_dir))
+        print(report.to_string(float_format='{:.2f}'.format))
+        return
+    print(build_cache(args.csv, args.cache_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import argparse
+import base64
+import concurrent.futures
+import html
+import os
+import re
+import time
+
+import plotly.offline
+
+import analytics
+import dataset
+import figures
+import refresh
+import storage
+
+EXPORT_DIR = 'report'
+
+# Part of the chart cache directory name; bumped whenever a chart's drawing changes
+EXPORT_FORMAT = 1
+
+# Widget defaults of the dashboard, used for the exported charts
+SCORE_RANGE = (1.85, 9.0)
+EPISODE_RANGE = (1, 100)
+TOP_GENRES = 10
+FAVORITE_GENRES = 10
+
+
+#---------PLOTLY CHARTS-------------
+
+# The interactive charts of the dashboard at its default settings. Charts the app draws
+# with st.line_chart, or for one selected type or genre, become one line per series.
+
+def plot_score_histogram(report):
+    return figures.plot_score_histogram(report, *SCORE_RANGE)
+
+
+def plot_score_trend(report):
+    return figures.plot_trends({'Average score': report['score_trend']}, 'Average Score Trend Over Years', 'Score')
+
+
+def plot_episode_histogram(report):
+    return figures.plot_episode_histogram(report, *EPISODE_RANGE)
+
+
+def plot_type_trends(report):
+    return figures.plot_trends(report['type_trends'], 'Anime Type Popularity Trend', 'Titles')
+
+
+def plot_season_trends(report):
+    return figures.plot_trends(report['season_trends'], 'Premieres per Season', 'Titles')
+
+
+def plot_genre_favorites(report):
+    return figures.plot_genre_favorites(report['genre_favorites'], FAVORITE_GENRES)
+
+
+def plot_genre_trends(report):
+    return figures.plot_trends(report['genre_trends'], 'Genre Popularity Trend', 'Titles')
+
+
+PLOTS = {
+    'score-histogram': plot_score_histogram,
+    'score-trend': plot_score_trend,
+    'episode-histogram': plot_episode_histogram,
+    'popularity-trend': figures.plot_popularity_trend,
+    'type-trends': plot_type_trends,
+    'season-trends': plot_season_trends,
+    'genre-favorites': plot_genre_favorites,
+    'genre-trends': plot_genre_trends,
+    'score-popularity': lambda report: figures.plot_score_popularity(report['score_popularity']),
+    'episodes-score': lambda report: figures.plot_episodes_score(report['episodes_score']),
+    'engagement': lambda report: figures.plot_engagement(report['engagement']),
+}
+
+
+#---------SECTIONS-------------
+
+# Contents of each dashboard section, in the app's order. Items are ('chart', name, params)
+# for a Matplotlib chart of figures.CHARTS, ('plot', name, {}) for a chart of PLOTS,
+# ('table', caption, frame) and ('text', text, None).
+def sections(report):
+    episodes = report['episode_stats']
+    scatter_text = '{rows:,} titles, correlation {correlation:.2f}'
+    return [
+        ('Overview', [('table', 'Subset of Data', report['preview']),
+                      ('table', 'Score Statistics', report['score_stats'].to_frame().transpose())]),
+        ('Distribution of Anime Scores', [('plot', 'score-histogram', {}), ('plot', 'score-trend', {})]),
+        ('Genre Analysis', [('chart', 'top-genres', {'top_n': TOP_GENRES}),
+                            ('table', 'Scored Titles per Genre', report['genre_counts'].rename('Titles').to_frame())]),
+        ('Anime Types Distribution', [('chart', 'types', {}),
+                                      ('table', 'Scored Titles per Type', report['type_counts'].rename('Titles').to_frame())]),
+        ('Episode Count Analysis', [('table', 'Descriptive Statistics for the Episodes Column',
+                                     episodes['stats'].to_frame().transpose()),
+                                    ('text', f"{episodes['missing']:,} titles have no episode count", None),
+                                    ('plot', 'episode-histogram', {})]),
+        ('Trends in Airing and Premiering', [('chart', 'airing', {}),
+                                             ('table', 'Premiere Seasons', report['season_stats']),
+                                             ('plot', 'season-trends', {})]),
+        ('Popularity Trends', [('plot', 'popularity-trend', {}), ('plot', 'type-trends', {})]),
+        ('Favorite Genres', [('plot', 'genre-favorites', {}), ('plot', 'genre-trends', {})]),
+        ('Score vs. Popularity', [('plot', 'score-popularity', {}),
+                                  ('text', scatter_text.format(**report['score_popularity']), None)]),
+        ('Score Distribution by Genre', [('chart', 'score-by-genre', {'genre': genre}) for genre in report['genre_scores']]),
+        ('Longevity Analysis', [('plot', 'episodes-score', {}),
+                                ('text', scatter_text.format(**report['episodes_score']), None)]),
+        ('Genre and Type Correlation', [('chart', 'genre-type', {})]),
+        ('Member Engagement', [('plot', 'engagement', {}),
+                               ('table', 'Members per Status', report['engagement'].rename('Members').to_frame())]),
+    ]
+
+
+#---------RENDERING-------------
+
+def slug(text):
+    return re.sub(r'[^A-Za-z0-9]+', '-', text).strip('-').lower()
+
+
+def item_file(kind, name, params):
+    stem = '-'.join([name] + [slug(str(value)) for value in params.values()])
+    return stem + ('.png' if kind == 'chart' else '.html')
+
+
+# Rendered charts of one data version, reused by every later export of the same data
+def version_chart_dir(version, cache_dir=dataset.CACHE_DIR):
+    return os.path.join(cache_dir, 'export', f'{version}-r{analytics.REPORT_FORMAT}-v{EXPORT_FORMAT}')
+
+
+def chart_dir(path=dataset.ANIME_CSV, delta_dir=refresh.DELTA_DIR, cache_dir=dataset.CACHE_DIR, streamed=False):
+    return version_chart_dir(analytics.report_version(path, delta_dir, streamed), cache_dir)
+
+
+# PNG of a Matplotlib chart rendered by an earlier export or warm-up, or None
+def cached_chart(version, name, params, cache_dir=dataset.CACHE_DIR):
+    try:
+        with open(os.path.join(version_chart_dir(version, cache_dir), item_file('chart', name, params)), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+# Each worker process loads the stored report once
+def start_worker(path, delta_dir, cache_dir, streamed):
+    global worker_report
+    worker_report = analytics.load_report(path, delta_dir, cache_dir, streamed)
+
+
+def render_item(kind, name, params, target):
+    if kind == 'chart':
+        output = figures.render_chart(name, worker_report, **params)
+    else:
+        output = PLOTS[name](worker_report).to_html(full_html=False, include_plotlyjs=False).encode()
+    return storage.write_bytes(target, output)
+
+
+# Renders the charts not yet in the chart cache of this data version, spread over `workers`
+# processes, and returns the cache directory
+def render_charts(path=dataset.ANIME_CSV, delta_dir=refresh.DELTA_DIR, cache_dir=dataset.CACHE_DIR,
+                  streamed=False, workers=None, log=None):
+    report = analytics.load_report(path, delta_dir, cache_dir, streamed)
+    target_dir = chart_dir(path, delta_dir, cache_dir, streamed)
+    os.makedirs(target_dir, exist_ok=True)
+
+    # Dropping charts of older data versions, drawn in the same mode
+    storage.drop_stale(os.path.join(cache_dir, 'export', '*'), keep=[target_dir],
+                       belongs=lambda stale: (f'{analytics.STREAMING_SUFFIX}-r' in stale) == streamed)
+
+    items = [item for _, contents in sections(report) for item in contents if item[0] in ('chart', 'plot')]
+    pending = [(kind, name, params, os.path.join(target_dir, item_file(kind, name, params)))
+               for kind, name, params in items]
+    pending = [task for task in pending if not os.path.exists(task[3])]
+    if log:
+        log(f'{len(items) - len(pending)} of {len(items)} charts cached, rendering {len(pending)}')
+
+    if workers == 1 or len(pending) <= 1:
+        start_worker(path, delta_dir, cache_dir, streamed)
+        for task in pending:
+            render_item(*task)
+    elif pending:
+        with concurrent.futures.ProcessPoolExecutor(workers, initializer=start_worker,
+                                                    initargs=(path, delta_dir, cache_dir, streamed)) as pool:
+            list(pool.map(render_item, *zip(*pending)))
+    return target_dir
+
+
+#---------HTML REPORT-------------
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script type="text/javascript">{plotlyjs}</script>
+<style>
+body {{ font-family: sans-serif; max-width: 1100px; margin: 0 auto; padding: 1em; }}
+img {{ max-width: 100%; }}
+table {{ border-collapse: collapse; font-size: 0.9em; margin: 1em 0; }}
+th, td {{ border: 1px solid #ddd; padding: 0.25em 0.5em; text-align: right; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<p>Data version {version}</p>
+{body}
+</body>
+</html>
+"""
+
+
+def render_html(report, target_dir, version, title='Anime Analytics Pro', png_dir=None):
+    parts = []
+    for heading, contents in sections(report):
+        parts.append(f'<h2>{html.escape(heading)}</h2>')
+        for kind, name, params in contents:
+            if kind == 'table':
+                parts.append(f'<h3>{html.escape(name)}</h3>')
+                parts.append(params.to_html(float_format='{:,.2f}'.format, border=0))
+            elif kind == 'text':
+                parts.append(f'<p>{html.escape(name)}</p>')
+            elif kind == 'plot':
+                with open(os.path.join(target_dir, item_file(kind, name, params))) as f:
+                    parts.append(f.read())
+            else:
+                file = item_file(kind, name, params)
+                with open(os.path.join(target_dir, file), 'rb') as f:
+                    image = f.read()
+                if png_dir:
+                    with open(os.path.join(png_dir, file), 'wb') as f:
+                        f.write(image)
+                tag = f'<img src="data:image/png;base64,{base64.b64encode(image).decode()}" alt="{html.escape(file)}">'
+                # Charts drawn once per genre are folded away
+                if params.get('genre'):
+                    tag = f'<details><summary>{html.escape(params["genre"])}</summary>{tag}</details>'
+                parts.append(tag)
+    return PAGE.format(title=html.escape(title), plotlyjs=plotly.offline.get_plotlyjs(), version=html.escape(version),
+                       body='\n'.join(parts))
+
+
+# A self-contained index.html with every section's charts and tables, plus the Matplotlib
+# charts as PNG files, in output_dir
+def export(path=dataset.ANIME_CSV, output_dir=EXPORT_DIR, delta_dir=refresh.DELTA_DIR, cache_dir=dataset.CACHE_DIR,
+           streamed=False, workers=None, log=None):
+    target_dir = render_charts(path, delta_dir, cache_dir, streamed, workers, log)
+    report = analytics.load_report(path, delta_dir, cache_dir, streamed)
+    png_dir = os.path.join(output_dir, 'png')
+    os.makedirs(png_dir, exist_ok=True)
+    page = render_html(report, target_dir, analytics.report_version(path, delta_dir, streamed), png_dir=png_dir)
+    index = os.path.join(output_dir, 'index.html')
+    with open(index, 'w', encoding='utf-8') as f:
+        f.write(page)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export every dashboard section as a static HTML report')
+    parser.add_argument('csv', nargs='?', default=dataset.ANIME_CSV)
+    parser.add_argument('--output', default=EXPORT_DIR)
+    parser.add_argument('--delta-dir', default=refresh.DELTA_DIR)
+    parser.add_argument('--cache-dir', default=dataset.CACHE_DIR)
+    parser.add_argument('--workers', type=int, default=None, help='processes to use (default: one per CPU)')
+    parser.add_argument('--streaming', action='store_true', help='summarize the CSV in chunks instead of loading it')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    print(export(args.csv, args.output, args.delta_dir, args.cache_dir, args.streaming, args.workers, log=print))
+    print(f'{time.perf_counter() - started:.2f}s')
+
+
+if __name__ == "__main__":
+    main()
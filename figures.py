@@ -0,0 +1,216 @@
+import io
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+import seaborn as sns
+from matplotlib.figure import Figure
+
+import aggregates
+
+# Rendered charts kept per server process; the least recently used are dropped first
+FIGURE_CACHE_SIZE = 64
+
+# Same output options st.pyplot uses
+SAVE_OPTIONS = {'bbox_inches': 'tight', 'dpi': 200}
+
+# Points the trendline of a scatter chart is drawn through
+TRENDLINE_POINTS = 200
+
+
+#---------FIGURE RENDERING-------------
+
+# Draws a chart on a standalone Figure and returns the encoded image. The figure never
+# touches pyplot's global state and is cleared before returning, so nothing outlives the call.
+def render(draw, *args, figsize=(10, 6), format='png', **kwargs):
+    fig = Figure(figsize=figsize)
+    try:
+        draw(fig.subplots(), *args, **kwargs)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=format, **SAVE_OPTIONS)
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+#---------MATPLOTLIB CHARTS-------------
+
+# Each draws one chart of the report on ax; rendered to images by render()
+
+def draw_top_genres(ax, report, top_n):
+    # Counting titles per genre
+    genre_counts = report['genre_counts']
+    top_genres = dict(genre_counts.head(top_n))
+
+    sns.barplot(x=list(top_genres.values()), y=list(top_genres.keys()), ax=ax)
+    ax.set_title(f'Top {top_n} Genres in Anime')
+    ax.set_xlabel('Frequency')
+    ax.set_ylabel('Genres')
+
+
+def draw_types(ax, report):
+    # Counting the occurrences of each type, leaving out categories no scored title has
+    type_counts = report['type_counts']
+
+    sns.barplot(x=type_counts.index.astype(str), y=type_counts.values, ax=ax)
+    ax.set_title('Distribution of Different Types of Anime')
+    ax.set_xlabel('Type')
+    ax.set_ylabel('Frequency')
+
+
+def draw_airing(ax, report):
+    # Grouping data by aired year and calculating the count
+    yearly_counts = report['airing_trend']
+
+    sns.lineplot(x=yearly_counts.index, y=yearly_counts.values, ax=ax)
+    ax.set_title('Trend of Anime Airing Over Years')
+    ax.set_xlabel('Year')
+    ax.set_ylabel('Number of Anime')
+
+
+def draw_score_by_genre(ax, report, genre):
+    # Rated titles of the genre counted per score, drawn with the bins seaborn picks for the
+    # raw scores. Seaborn's weighted KDE takes (sum w)^2 / sum w^2 as the sample size, so the
+    # bandwidth is scaled back to that of the raw scores. A single distinct score has no KDE.
+    counts = report['genre_scores'][genre]
+    edges = aggregates.auto_bin_edges(counts)
+    effective = counts.sum() ** 2 / (counts.astype(float) ** 2).sum()
+    sns.histplot(x=counts.index, weights=counts.to_numpy(), bins=len(edges) - 1, binrange=(edges[0], edges[-1]),
+                 kde=len(counts) > 1, kde_kws={'bw_adjust': (effective / counts.sum()) ** 0.2}, ax=ax)
+
+
+def draw_genre_type(ax, report):
+    genre_type_counts = report['genre_type_counts']
+    sns.heatmap(genre_type_counts, annot=True, fmt="d", cmap="YlGnBu", ax=ax)
+    ax.set_title("Occurrence of Anime Genres Across Different Types")
+    ax.set_xlabel("Type of Anime")
+    ax.set_ylabel("Genre")
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.tick_params(axis='y', labelrotation=0)
+
+
+# Chart name -> (draw function, figure size)
+CHARTS = {
+    'top-genres': (draw_top_genres, (12, 6)),
+    'types': (draw_types, (10, 6)),
+    'airing': (draw_airing, (15, 6)),
+    'score-by-genre': (draw_score_by_genre, (10, 6)),
+    'genre-type': (draw_genre_type, (12, 10)),
+}
+
+
+def render_chart(chart, report, format='png', **params):
+    draw, figsize = CHARTS[chart]
+    return render(draw, report, figsize=figsize, format=format, **params)
+
+
+#---------PLOTLY CHARTS-------------
+
+# Histogram of the values in a range, drawn from the pre-binned counts
+def plot_histogram(histogram, low, high, title, xlabel, color=None, kde=False):
+    edges, counts = histogram.histogram(low, high, bins=30)
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+                           marker=dict(color=color, line=dict(color='white', width=1)), name='Frequency'))
+    if kde and len(counts):
+        # Scaling the density to counts per bin, like seaborn does
+        points, density = histogram.kde(low, high)
+        fig.add_trace(go.Scatter(x=points, y=density * counts.sum() * (edges[-1] - edges[0]) / len(counts),
+                                 mode='lines', line=dict(color=color), name='KDE'))
+    fig.update_layout(title=title, xaxis_title=xlabel, yaxis_title='Frequency', showlegend=False, bargap=0)
+    return fig
+
+
+def plot_score_histogram(report, low, high):
+    return plot_histogram(report['score_histogram'], low, high, 'Score Distribution', 'Score',
+                          color='#7F7FFF', kde=True)
+
+
+def plot_episode_histogram(report, low, high):
+    return plot_histogram(report['episode_histogram'], low, high, 'Episode Distribution', 'Number of Episodes')
+
+
+# Line per series of a {name: yearly series} dict, for the charts the app draws with st.line_chart
+def plot_trends(trends, title, ylabel):
+    fig = go.Figure([go.Scatter(x=series.index, y=series.values, mode='lines', name=str(name))
+                     for name, series in trends.items()])
+    fig.update_layout(title=title, xaxis_title='Year', yaxis_title=ylabel)
+    return fig
+
+
+def plot_popularity_trend(report):
+    popularity_trends = report['popularity_trend'].rename_axis('Year').reset_index()
+
+    fig = px.line(popularity_trends, x='Year', y='Popularity',
+                  title='Average Anime Popularity Trends Over Years',
+                  labels={'Popularity': 'Average Popularity', 'Year': 'Year'},
+                  markers=True)
+
+    fig.update_traces(line=dict(color='Turquoise', width=3),
+                      marker=dict(color='DarkSlateBlue', size=6, line=dict(color='MediumPurple', width=2)))
+
+    fig.update_traces(hovertemplate='Year: %{x}<br>Popularity: %{y:.2f}')
+
+    fig.update_xaxes(title_text='Year', tickangle=-45, gridcolor='LightGrey')
+
+    # Inverting y-axis as lower numbers indicate higher popularity
+    fig.update_yaxes(title_text='Average Popularity', autorange='reversed', gridcolor='LightGrey')
+
+    fig.update_layout(autosize=True)
+    return fig
+
+
+def plot_genre_favorites(genre_favorites, max_genres):
+
+    selected_genres = genre_favorites.head(max_genres).reset_index()
+    selected_genres.columns = ['Genre', 'Total Favorites']
+
+    fig = px.bar(selected_genres, x='Total Favorites', y='Genre', orientation='h', 
+                 title='Top 10 Favorite Genres', 
+                 labels={'Total Favorites': 'Total Favorites', 'Genre': 'Genre'},
+                 text='Total Favorites',
+                 color='Genre',
+                 color_continuous_scale=px.colors.sequential.Viridis)
+    fig.update_layout(
+        yaxis={'categoryorder':'total ascending'},
+        plot_bgcolor='rgba(0,0,0,0)',  
+        paper_bgcolor='rgba(0,0,0,0)',      
+        title_font_size=22,      
+        title_font_family='Arial',
+    )
+    return fig
+
+
+def plot_score_popularity(score_popularity):
+    fig = px.scatter(score_popularity['points'], x='Score', y='Members',
+                     title='Correlation between Anime Score and Popularity',
+                     opacity=0.5, render_mode='webgl')
+
+    # OLS trendline fitted on every title, over every title's scores. On the log axis the straight
+    # line is a curve, so it is drawn through many points, leaving out those at or below zero.
+    trend_x = np.linspace(*score_popularity['x_range'], TRENDLINE_POINTS)
+    trend_y = score_popularity['intercept'] + score_popularity['slope'] * trend_x
+    fig.add_scatter(x=trend_x[trend_y > 0], y=trend_y[trend_y > 0],
+                    mode='lines', line=dict(color='red'), name='OLS trendline', showlegend=False)
+    fig.update_layout(xaxis_title='Score', yaxis_title='Number of Members',
+                      yaxis_type='log')  # log scale for Members due to wide range
+    return fig
+
+
+def plot_episodes_score(episodes_score):
+    fig = px.scatter(episodes_score['points'], x='Episodes', y='Score',
+                     title='Correlation between Number of Episodes and Anime Score',
+                     log_x=True, opacity=0.5, render_mode='webgl')
+    fig.update_layout(xaxis_title='Number of Episodes (log scale)', yaxis_title='Score')
+    return fig
+
+
+def plot_engagement(engagement):
+    # Summing up the counts for each category
+    total_engagement = engagement.reset_index()
+    total_engagement.columns = ['Status', 'Number of Members']
+
+    fig = px.bar(total_engagement, x='Status', y='Number of Members', color='Status',
+                 labels={'Number of Members':'Number of Members'},
+                 title='Member Engagement Across Different Anime Statuses')
+    fig.update_layout(xaxis_title='Status', yaxis_title='Number of Members')
+    return fig
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+
+#---------GENRE INDEX-------------
+
+# Boolean title x genre matrix over one sorted genre vocabulary. Rows follow the positions
+# of the frame the index was built from, so masks can be combined with that frame's masks.
+class GenreIndex:
+
+    def __init__(self, genre_lists):
+        exploded = pd.Series(genre_lists.to_numpy(), dtype=object).explode().dropna()
+        self.genres = sorted(exploded.unique())
+        self.columns = {genre: i for i, genre in enumerate(self.genres)}
+
+        # Column-major so that selecting a few genres reads contiguous memory
+        self.matrix = np.zeros((len(genre_lists), len(self.genres)), dtype=bool, order='F')
+        codes = pd.Categorical(exploded, categories=self.genres).codes
+        self.matrix[exploded.index.to_numpy(), codes] = True
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def positions(self, genres):
+        return [self.columns[genre] for genre in genres if genre in self.columns]
+
+    # Titles having any, all and none of the given genres. Genres missing from the
+    # vocabulary match no title.
+    def mask(self, any_of=(), all_of=(), none_of=()):
+        mask = np.ones(len(self), dtype=bool)
+        if any_of:
+            mask &= self.matrix[:, self.positions(any_of)].any(axis=1)
+        if all_of:
+            positions = self.positions(all_of)
+            if len(positions) < len(set(all_of)):
+                return np.zeros(len(self), dtype=bool)
+            mask &= self.matrix[:, positions].all(axis=1)
+        if none_of:
+            mask &= ~self.matrix[:, self.positions(none_of)].any(axis=1)
+        return mask
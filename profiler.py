@@ -0,0 +1,133 @@
+import contextlib
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+
+import pandas as pd
+
+# Opt-in: APP_PROFILE=1 records every section and loader of each rerun and shows them in
+# the sidebar. APP_PROFILE_LOG=<path> also appends the records to a JSONL file.
+ENABLED = os.environ.get('APP_PROFILE', '0') == '1'
+LOG_PATH = os.environ.get('APP_PROFILE_LOG') or None
+
+log_lock = threading.Lock()
+
+# Streamlit runs each session's script in its own thread, so every thread has its own run
+local = threading.local()
+
+
+#---------RUN RECORDS-------------
+
+# Records of one script run. Frames track nested measurements so an outer section's peak
+# allocation still covers the loaders it called; the first frame is the whole run.
+class Run:
+
+    def __init__(self, label=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.started = time.perf_counter()
+        self.cpu_started = time.thread_time()
+        self.records = []
+        tracemalloc.reset_peak()
+        self.frames = [{'record': None, 'start': tracemalloc.get_traced_memory()[0], 'peak': 0}]
+
+    def table(self):
+        return pd.DataFrame(self.records, columns=['name', 'kind', 'cache', 'wall_ms', 'cpu_ms', 'peak_mb'])
+
+
+def start_run(label=None):
+    if ENABLED and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    local.run = Run(label) if ENABLED else None
+    return local.run
+
+
+def current_run():
+    return getattr(local, 'run', None)
+
+
+# Wall time, this thread's CPU time and peak traced allocation of the block, recorded in the
+# order blocks start. The peak is process-wide, so concurrent sessions show up in each other's numbers.
+@contextlib.contextmanager
+def measure(name, kind='section'):
+    run = current_run()
+    if run is None:
+        yield None
+        return
+
+    record = {'name': name, 'kind': kind, 'cache': None}
+    run.frames[-1]['peak'] = max(run.frames[-1]['peak'], tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+    frame = {'record': record, 'start': tracemalloc.get_traced_memory()[0], 'peak': 0}
+    run.frames.append(frame)
+    run.records.append(record)
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield record
+    finally:
+        record['wall_ms'] = (time.perf_counter() - wall) * 1000
+        record['cpu_ms'] = (time.thread_time() - cpu) * 1000
+        peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+        record['peak_mb'] = max(peak - frame['start'], 0) / 2 ** 20
+        run.frames.pop()
+        run.frames[-1]['peak'] = max(run.frames[-1]['peak'], peak)
+
+
+# Wraps a Streamlit cache decorator so each call is measured and marked as a cache hit or
+# a miss. A miss is a call where the function body ran.
+#
+#     @profiler.cached(st.cache_resource)
+#     def load_cube(_anime, version): ...
+def cached(cache):
+    def decorate(func):
+        if not ENABLED:
+            return cache(func)
+
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            run = current_run()
+            if run is not None and len(run.frames) > 1:
+                run.frames[-1]['record']['cache'] = 'miss'
+            return func(*args, **kwargs)
+
+        cached_func = cache(compute)
+
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            with measure(func.__name__, 'loader') as record:
+                result = cached_func(*args, **kwargs)
+                if record is not None and record['cache'] is None:
+                    record['cache'] = 'hit'
+                return result
+
+        call.clear = cached_func.clear
+        return call
+    return decorate
+
+
+def finish_run(label=None):
+    run = current_run()
+    if run is None:
+        return None
+    run.label = label or run.label
+    root = run.frames[0]
+    peak = max(root['peak'], tracemalloc.get_traced_memory()[1])
+    run.records.append({'name': 'total', 'kind': 'run', 'cache': None,
+                        'wall_ms': (time.perf_counter() - run.started) * 1000,
+                        'cpu_ms': (time.thread_time() - run.cpu_started) * 1000, 'peak_mb': max(peak - root['start'], 0) / 2 ** 20})
+    if LOG_PATH:
+        append_log(run, LOG_PATH)
+    local.run = None
+    return run
+
+
+def append_log(run, path):
+    timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds')
+    lines = [json.dumps(dict(record, run=run.id, label=run.label, time=timestamp)) for record in run.records]
+    with log_lock, open(path, 'a') as f:
+        f.write(''.join(line + '\n' for line in lines))
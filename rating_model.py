@@ -0,0 +1,362 @@
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import MaxAbsScaler, MultiLabelBinarizer, LabelEncoder
+
+import dataset
+import refresh
+import storage
+
+# Trained models, one file per data version, estimator and set of hyperparameters
+MODEL_DIR = os.path.join(dataset.CACHE_DIR, 'models')
+
+# Estimator name -> (regressor, default hyperparameters). Tree models read the studio as a
+# label code; the linear model reads one-hot studios and the genre matrix as sparse columns.
+ESTIMATORS = {
+    'random-forest': (RandomForestRegressor, {'n_estimators': 100, 'random_state': 0}),
+    'gradient-boosting': (HistGradientBoostingRegressor, {'max_iter': 200, 'random_state': 0}),
+    'linear': (Ridge, {'alpha': 1.0}),
+}
+DEFAULT_ESTIMATOR = 'random-forest'
+DEFAULT_PARAMS = ESTIMATORS[DEFAULT_ESTIMATOR][1]
+SPARSE_ESTIMATORS = ['linear']
+
+# Cores a random forest fits on; -1 is every core. Not part of the model's key, as the
+# fitted trees are the same on any number of cores.
+N_JOBS = -1
+
+# Random forests grow this many rounds of trees, reporting progress after each
+FIT_ROUNDS = 10
+
+# Single-title predictions timed together by the estimator comparison
+PREDICTIONS = 100
+
+# Columns of a batch of candidate titles, named as in anime.csv. Studios is optional and
+# Genres is a comma-separated list like the dataset's.
+CANDIDATE_COLUMNS = ['Year', 'Episodes', 'Genres']
+
+# Studio the dataset gives titles without one; blank and unseen studios are predicted as it
+UNKNOWN_STUDIO = 'Unknown'
+
+
+#---------RATING MODEL-------------
+
+def make_regressor(estimator, params):
+    regressor, _ = ESTIMATORS[estimator]
+    if regressor is RandomForestRegressor:
+        return regressor(n_jobs=N_JOBS, **params)
+    if estimator in SPARSE_ESTIMATORS:
+        # Year and episode counts scaled to the 0-1 range of the indicator columns, keeping
+        # the matrix sparse
+        return make_pipeline(MaxAbsScaler(), regressor(**params))
+    return regressor(**params)
+
+
+def fit_regressor(model, X, y, progress=None):
+    if not isinstance(model, RandomForestRegressor):
+        return model.fit(X, y)
+
+    # Grown in rounds on a warm start; the trees come out the same as in a single fit
+    n_estimators = model.n_estimators
+    model.set_params(warm_start=True)
+    for i in range(1, FIT_ROUNDS + 1):
+        model.set_params(n_estimators=max(1, n_estimators * i // FIT_ROUNDS))
+        model.fit(X, y)
+        if progress:
+            progress(0.1 + 0.8 * i / FIT_ROUNDS, f'Fitted {len(model.estimators_)} of {n_estimators} trees')
+    return model.set_params(warm_start=False)
+
+
+# Genre/studio encoders, the fitted regressor and its held-out metrics, saved together
+class RatingModel:
+
+    def __init__(self, params=None, estimator=DEFAULT_ESTIMATOR):
+        self.estimator = estimator
+        self.params = dict(ESTIMATORS[estimator][1] if params is None else params)
+        self.mlb = MultiLabelBinarizer()
+        self.le = LabelEncoder()
+        self.model = make_regressor(estimator, self.params)
+        self.metrics = {}
+
+    @property
+    def genres(self):
+        return list(self.mlb.classes_)
+
+    @property
+    def studios(self):
+        return list(self.le.classes_)
+
+    # Feature matrix of the estimator: dense columns for tree models, sparse ones with
+    # one-hot studios and log episode counts for the linear model. A studio code of -1, for
+    # a blank or unseen studio, has no one-hot column set.
+    def features(self, year, episodes, studio_encoded, genre_encoded):
+        if self.estimator not in SPARSE_ESTIMATORS:
+            return np.column_stack([year, episodes, studio_encoded, genre_encoded])
+        known = np.asarray(studio_encoded) >= 0
+        rows = np.arange(len(known))[known]
+        studios = sp.csr_matrix((np.ones(len(rows)), (rows, np.asarray(studio_encoded)[known])),
+                                shape=(len(known), len(self.studios)))
+        numeric = sp.csr_matrix(np.column_stack([year, np.log1p(episodes)]))
+        return sp.hstack([numeric, studios, sp.csr_matrix(genre_encoded)], format='csr')
+
+    # progress(fraction, stage) is called as training goes along
+    def fit(self, anime, progress=None):
+        if progress:
+            progress(0.0, 'Encoding genres and studios')
+        df = anime.dropna(subset=['Score', 'Year', 'Episodes'])
+
+        # Genre and studio encoding
+        genre_encoded = self.mlb.fit_transform(df['Genre List'])
+        studio_encoded = self.le.fit_transform(df['Studios'])
+
+        X = self.features(df['Year'].to_numpy(), df['Episodes'].to_numpy(), studio_encoded, genre_encoded)
+        y = df['Score'].to_numpy()
+        self.year_range = (int(df['Year'].min()), int(df['Year'].max()))
+
+        # Splitting the data
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=0)
+
+        # Training model
+        if progress:
+            progress(0.1, f'Fitting on {len(y_train):,} titles')
+        fit_regressor(self.model, X_train, y_train, progress)
+
+        if progress:
+            progress(0.9, 'Scoring held-out titles')
+        predicted = self.model.predict(X_test)
+        self.metrics = {
+            'MAE': mean_absolute_error(y_test, predicted),
+            'RMSE': mean_squared_error(y_test, predicted) ** 0.5,
+            'R2': r2_score(y_test, predicted),
+            'Train rows': len(y_train),
+            'Test rows': len(y_test),
+        }
+        return self
+
+    def encode(self, year, episodes, genres, studio):
+        genre_encoded = self.mlb.transform([genres])
+        studio_encoded, _ = self.encode_studios(pd.Series([studio]))
+        return self.features([year], [episodes], studio_encoded, genre_encoded)
+
+    def predict_one(self, year, episodes, genres, studio):
+        return self.model.predict(self.encode(year, episodes, genres, studio))[0]
+
+    # Genre columns of many titles at once. Genres the model was not trained on are left
+    # out of the encoding and returned per title.
+    def encode_genres(self, genres):
+        lists = dataset.genre_lists(genres.reset_index(drop=True))
+        exploded = pd.Series(lists.to_numpy(), dtype=object).explode().dropna().str.strip()
+        exploded = exploded[exploded != '']
+        codes = pd.Categorical(exploded, categories=self.genres).codes
+        known = codes >= 0
+
+        encoded = np.zeros((len(genres), len(self.genres)))
+        encoded[exploded.index[known], codes[known]] = 1
+        unknown = exploded[~known].groupby(level=0).agg(', '.join).reindex(range(len(genres)), fill_value='')
+        return encoded, unknown.to_numpy()
+
+    # Studio codes of many titles at once, with whether each studio was unseen. Blank and
+    # unseen studios take the code of UNKNOWN_STUDIO for tree models, or -1 when the model
+    # has no such studio, and -1 for the linear model, which then sets no studio column.
+    def encode_studios(self, studios):
+        studios = studios.fillna('').astype(str).str.strip()
+        codes = pd.Categorical(studios, categories=self.studios).codes.astype(np.int64)
+        unknown = (codes < 0) & (studios != '').to_numpy()
+        if self.estimator not in SPARSE_ESTIMATORS and UNKNOWN_STUDIO in self.studios:
+            codes[codes < 0] = self.studios.index(UNKNOWN_STUDIO)
+        return codes, unknown
+
+    # Predicted scores of a frame of candidate titles (CANDIDATE_COLUMNS plus an optional
+    # Studios column), in one predict call. Returns the candidates with 'Predicted Score',
+    # 'Unknown genres' and 'Unknown studio' added; titles without a valid year or episode
+    # count get no prediction.
+    def predict_frame(self, candidates):
+        missing = [column for column in CANDIDATE_COLUMNS if column not in candidates.columns]
+        if missing:
+            raise ValueError(f"Candidates are missing column(s): {', '.join(missing)}")
+
+        year = pd.to_numeric(candidates['Year'], errors='coerce').to_numpy(dtype=float)
+        episodes = pd.to_numeric(candidates['Episodes'], errors='coerce').to_numpy(dtype=float)
+        genre_encoded, unknown_genres = self.encode_genres(candidates['Genres'])
+        studios = candidates['Studios'] if 'Studios' in candidates else pd.Series('', index=candidates.index)
+        studio_encoded, unknown_studio = self.encode_studios(studios)
+
+        X = self.features(year, episodes, studio_encoded, genre_encoded)
+        valid = ~np.isnan(year) & ~np.isnan(episodes)
+        predicted = np.full(len(candidates), np.nan)
+        if valid.any():
+            predicted[valid] = self.model.predict(X[valid])
+
+        return candidates.assign(**{'Predicted Score': predicted, 'Unknown genres': unknown_genres,
+                                    'Unknown studio': unknown_studio})
+
+
+#---------ARTIFACT STORE-------------
+
+def params_key(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def model_path(version, params=None, model_dir=MODEL_DIR, estimator=DEFAULT_ESTIMATOR):
+    params = ESTIMATORS[estimator][1] if params is None else params
+    return os.path.join(model_dir, f'rating-model-{version}-{estimator}-{params_key(params)}.joblib')
+
+
+def train(anime, version, params=None, model_dir=MODEL_DIR, estimator=DEFAULT_ESTIMATOR, progress=None):
+    rating_model = RatingModel(params, estimator).fit(anime, progress)
+    target = storage.dump(rating_model, model_path(version, params, model_dir, estimator))
+
+    # Dropping models of the same estimator and hyperparameters trained on older versions of the data
+    key = f'{estimator}-{params_key(rating_model.params)}'
+    storage.drop_stale(os.path.join(model_dir, f'rating-model-*-{key}.joblib'), keep=[target])
+    return rating_model
+
+
+def load_or_train(anime, version, params=None, model_dir=MODEL_DIR, estimator=DEFAULT_ESTIMATOR, progress=None):
+    target = model_path(version, params, model_dir, estimator)
+    if os.path.exists(target):
+        return joblib.load(target)
+    return train(anime, version, params, model_dir, estimator, progress)
+
+
+#---------BACKGROUND TRAINING-------------
+
+# Loads or trains a model on a daemon thread, so no page request waits for training. The
+# page reads progress and stage while it runs, then model, or error if training failed.
+class TrainingJob:
+
+    def __init__(self, anime, version, params=None, model_dir=MODEL_DIR, estimator=DEFAULT_ESTIMATOR):
+        self.args = (anime, version, params, model_dir, estimator)
+        self.estimator = estimator
+        self.progress = 0.0
+        self.stage = 'Waiting to start'
+        self.model = None
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    @property
+    def done(self):
+        return self.model is not None or self.error is not None
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def report(self, progress, stage):
+        self.progress, self.stage = progress, stage
+
+    def run(self):
+        try:
+            self.model = load_or_train(*self.args, progress=self.report)
+            self.report(1.0, 'Ready')
+        except Exception as e:
+            # Kept for the page to show, as an exception would otherwise end with the thread
+            self.error = e
+        self.args = None
+
+    # The model once trained, or None when timeout seconds pass first
+    def wait(self, timeout=None):
+        self.thread.join(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.model
+
+
+#---------ESTIMATOR COMPARISON-------------
+
+# Fit time, single-title and batch prediction latency, and held-out error of each estimator
+# on the same titles and split
+def compare_estimators(anime, estimators=ESTIMATORS, predictions=PREDICTIONS):
+    candidates = anime.dropna(subset=['Year', 'Episodes']).head(1000)
+    candidates = pd.DataFrame({'Year': candidates['Year'], 'Episodes': candidates['Episodes'],
+                               'Genres': candidates['Genres'].astype(object), 'Studios': candidates['Studios'].astype(object)})
+    rows = []
+    for estimator in estimators:
+        started = time.perf_counter()
+        rating_model = RatingModel(estimator=estimator).fit(anime)
+        fit_seconds = time.perf_counter() - started
+
+        genres, studio = rating_model.genres[:3], rating_model.studios[0]
+        latencies = []
+        for _ in range(predictions):
+            started = time.perf_counter()
+            rating_model.predict_one(2020, 12, genres, studio)
+            latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        rating_model.predict_frame(candidates)
+        batch_seconds = time.perf_counter() - started
+
+        rows.append({'estimator': estimator, 'fit_s': fit_seconds,
+                     'predict_one_ms': statistics.median(latencies) * 1000,
+                     f'predict_{len(candidates)}_ms': batch_seconds * 1000,
+                     **{metric: rating_model.metrics[metric] for metric in ['MAE', 'RMSE', 'R2']}})
+    return pd.DataFrame(rows).set_index('estimator')
+
+
+# Scores a CSV of candidate titles and writes them with their predictions
+def predict_csv(rating_model, candidates_path, output_path):
+    scored = rating_model.predict_frame(pd.read_csv(candidates_path))
+    scored.to_csv(output_path, index=False)
+    return scored
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the anime rating model ahead of serving, score a CSV '
+                                                 'of candidate titles with it, or compare the estimators')
+    parser.add_argument('command', choices=['train', 'predict', 'compare'])
+    parser.add_argument('candidates', nargs='?', help='CSV with Year, Episodes, Genres and optionally Studios')
+    parser.add_argument('--output', help='where predict writes the scored CSV (default: stdout)')
+    parser.add_argument('--csv', default=dataset.ANIME_CSV)
+    parser.add_argument('--delta-dir', default=refresh.DELTA_DIR)
+    parser.add_argument('--cache-dir', default=dataset.CACHE_DIR)
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--estimator', choices=list(ESTIMATORS), default=DEFAULT_ESTIMATOR)
+    parser.add_argument('--n-estimators', type=int, help='trees of the random forest')
+    args = parser.parse_args()
+
+    # Imported by name so the saved model refers to rating_model.RatingModel rather than __main__
+    from rating_model import compare_estimators, load_or_train, train
+
+    params = dict(ESTIMATORS[args.estimator][1])
+    if args.n_estimators is not None:
+        if args.estimator != 'random-forest':
+            parser.error('--n-estimators only applies to the random forest')
+        params['n_estimators'] = args.n_estimators
+    # Trained on the catalog with its deltas applied and keyed by its version, like the app's models
+    version = refresh.data_version(args.csv, args.delta_dir)
+    anime = refresh.refresh(args.csv, args.delta_dir, args.cache_dir)[0]
+
+    if args.command == 'compare':
+        print(compare_estimators(anime).to_string(float_format='{:.3f}'.format))
+        return
+
+    if args.command == 'predict':
+        if args.candidates is None:
+            parser.error('predict needs a candidates CSV')
+        rating_model = load_or_train(anime, version, params, args.model_dir, args.estimator)
+        predict_csv(rating_model, args.candidates, args.output or sys.stdout)
+        return
+
+    rating_model = train(anime, version, params, args.model_dir, args.estimator)
+    print(model_path(version, params, args.model_dir, args.estimator))
+    print(json.dumps(rating_model.metrics, indent=2))
+
+
+if __name__ == "__main__":
+    main()
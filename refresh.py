@@ -0,0 +1,147 @@
+import argparse
+import glob
+import os
+import time
+
+import joblib
+import pandas as pd
+
+import aggregates
+import dataset
+import storage
+import versions
+
+# CSV files with new or updated titles, in anime.csv's format. They are applied on top of
+# anime.csv in file name order; a title in a later file replaces the same MAL_ID.
+DELTA_DIR = versions.DELTA_DIR
+
+
+#---------DATA VERSION-------------
+
+delta_files = versions.delta_files
+
+delta_key = versions.delta_key
+
+# Version of anime.csv plus its deltas. Without deltas it is anime.csv's own version.
+data_version = versions.data_version
+
+
+#---------MERGING-------------
+
+# anime with the titles of delta added, replacing titles with the same MAL_ID. Returns the
+# merged frame, the replaced rows and the added rows.
+def merge_delta(anime, delta):
+    delta = delta.drop_duplicates('MAL_ID', keep='last')
+    replaced = anime['MAL_ID'].isin(delta['MAL_ID']).to_numpy()
+    kept = anime[~replaced]
+
+    # Categoricals keep their dtype through the concat only with the same categories
+    kept, delta = kept.copy(), delta.copy()
+    for column in dataset.CATEGORY_COLUMNS:
+        categories = kept[column].cat.categories.union(delta[column].cat.categories)
+        kept[column] = kept[column].cat.set_categories(categories)
+        delta[column] = delta[column].cat.set_categories(categories)
+
+    merged = pd.concat([kept, delta], ignore_index=True)
+    # Numbers the delta needed a wider type for, e.g. the first missing value in a count
+    for column in merged.select_dtypes('number').columns:
+        if merged[column].dtype != anime[column].dtype:
+            merged[column] = dataset.downcast(merged[column])
+    return merged, anime[replaced], delta
+
+
+#---------STORED STATE-------------
+
+# Each version keeps its merged frame in Arrow format and its aggregate cube with the
+# list of deltas it includes, so the next refresh starts from it. Files are named after the
+# CSV like its other caches, so CSVs sharing a cache directory keep their own states.
+
+def state_prefix(path=dataset.ANIME_CSV, cache_dir=dataset.CACHE_DIR):
+    return f'{dataset.cache_prefix(path, cache_dir)}-refreshed'
+
+
+def frame_path(path, version, cache_dir=dataset.CACHE_DIR):
+    return f'{state_prefix(path, cache_dir)}-{version}-v{dataset.CACHE_FORMAT}.arrow'
+
+
+def state_path(path, version, cache_dir=dataset.CACHE_DIR):
+    return f'{state_prefix(path, cache_dir)}-{version}-v{dataset.CACHE_FORMAT}.joblib'
+
+
+def save_state(path, anime, cube, base, keys, version, cache_dir=dataset.CACHE_DIR):
+    # Without deltas the frame is the cache dataset.load_anime already keeps
+    if keys:
+        dataset.write_cache(anime, frame_path(path, version, cache_dir))
+    target = storage.dump({'base': base, 'deltas': keys, 'version': version, 'cube': cube},
+                          state_path(path, version, cache_dir))
+
+    # Dropping older states of the same CSV; only the newest is ever a starting point
+    storage.drop_stale(f'{state_prefix(path, cache_dir)}-*', keep=[target, frame_path(path, version, cache_dir)])
+
+
+def load_frame(path, state, cache_dir=dataset.CACHE_DIR):
+    if state['deltas']:
+        return dataset.read_cache(frame_path(path, state['version'], cache_dir))
+    return dataset.load_anime(path, cache_dir)
+
+
+# The stored state of the same anime.csv that includes the most of these deltas, as a
+# prefix of them, or None
+def find_state(path, base, keys, cache_dir=dataset.CACHE_DIR):
+    best = None
+    for candidate in glob.glob(f'{state_prefix(path, cache_dir)}-*-v{dataset.CACHE_FORMAT}.joblib'):
+        try:
+            state = joblib.load(candidate)
+        except (OSError, ValueError, EOFError):
+            continue
+        applied = state['deltas']
+        if state['base'] == base and applied == keys[:len(applied)]:
+            if best is None or len(applied) > len(best['deltas']):
+                best = state
+    return best
+
+
+# The dataset with every delta applied and its aggregate cube. Only deltas newer than the
+# last stored state are read, cleaned and summarized.
+def refresh(path=dataset.ANIME_CSV, delta_dir=DELTA_DIR, cache_dir=dataset.CACHE_DIR, log=None):
+    base = dataset.data_version(path)
+    deltas = delta_files(delta_dir)
+    keys = [delta_key(delta) for delta in deltas]
+    version = data_version(path, delta_dir)
+
+    state = find_state(path, base, keys, cache_dir)
+    if state is not None and state['version'] == version:
+        return load_frame(path, state, cache_dir), state['cube']
+
+    if state is None:
+        anime = dataset.load_anime(path, cache_dir)
+        cube = aggregates.AggregateCube(anime)
+        applied = 0
+    else:
+        anime, cube = load_frame(path, state, cache_dir), state['cube']
+        applied = len(state['deltas'])
+
+    for delta in deltas[applied:]:
+        started = time.perf_counter()
+        anime, removed, added = merge_delta(anime, dataset.load_csv(delta))
+        cube.update(removed, added)
+        if log:
+            log(f'{os.path.basename(delta)}: {len(added) - len(removed):+,} titles, {len(removed):,} updated '
+                f'({time.perf_counter() - started:.2f}s)')
+
+    save_state(path, anime, cube, base, keys, version, cache_dir)
+    return anime, cube
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply the delta files to the stored dataset and its aggregates')
+    parser.add_argument('csv', nargs='?', default=dataset.ANIME_CSV)
+    parser.add_argument('--delta-dir', default=DELTA_DIR)
+    parser.add_argument('--cache-dir', default=dataset.CACHE_DIR)
+    args = parser.parse_args()
+    anime, cube = refresh(args.csv, args.delta_dir, args.cache_dir, log=print)
+    print(f'{data_version(args.csv, args.delta_dir)}: {len(anime):,} titles')
+
+
+if __name__ == "__main__":
+    main()
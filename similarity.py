@@ -0,0 +1,79 @@
+import numpy as np
+from scipy import sparse
+
+# Weight of each part of the similarity: genre cosine, same type, same studio, and the
+# mean squared difference of the standardized numeric features (subtracted)
+WEIGHTS = {'genres': 1.0, 'type': 0.2, 'studio': 0.2, 'numeric': 0.25}
+
+# Episodes are compared on a log scale, so 12 vs 24 counts like 50 vs 100
+NUMERIC_FEATURES = ['Score', 'Episodes', 'Year']
+LOG_FEATURES = ['Episodes']
+
+# Standardized values are clipped so a few extreme titles don't dominate the distance
+Z_CLIP = 3.0
+
+
+# Sparse indicator matrix of a column's values; missing values and those in skip get no column
+def one_hot(values, skip=()):
+    values = values.astype('category')
+    categories = values.cat.categories
+    codes = values.cat.codes.to_numpy()
+    for value in skip:
+        if value in categories:
+            codes = np.where(codes == categories.get_loc(value), -1, codes)
+    rows = np.flatnonzero(codes >= 0)
+    return sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, codes[rows])),
+                             shape=(len(values), len(categories)))
+
+
+#---------SIMILARITY INDEX-------------
+
+# Content-based similarity of every title to a query title, from one sparse matrix-vector
+# product and one small dense one, so a query is linear in the catalog with no Python loop.
+#
+# similarity = w_genres * cosine(genres) + w_type * [same type] + w_studio * [same studio]
+#              - w_numeric * mean((z - z_query) ** 2)
+class SimilarityIndex:
+
+    def __init__(self, anime, genre_index, weights=WEIGHTS):
+        self.weights = dict(weights)
+
+        # Genre rows scaled to unit length, so their dot product is the cosine
+        genres = sparse.csr_matrix(genre_index.matrix, dtype=np.float32)
+        lengths = np.sqrt(np.asarray(genres.sum(axis=1)).ravel())
+        genres = sparse.diags(np.where(lengths > 0, 1 / np.maximum(lengths, 1), 0).astype(np.float32)) @ genres
+
+        # Square roots of the weights, so the weights apply once in the product of two rows
+        self.categorical = sparse.hstack([
+            np.sqrt(self.weights['genres']) * genres,
+            np.sqrt(self.weights['type']) * one_hot(anime['Type']),
+            np.sqrt(self.weights['studio']) * one_hot(anime['Studios'], skip=['Unknown']),
+        ], format='csr', dtype=np.float32)
+
+        # Standardized numeric features; missing values sit at the mean
+        numeric = anime[NUMERIC_FEATURES].astype(float)
+        numeric[LOG_FEATURES] = np.log1p(numeric[LOG_FEATURES])
+        z = ((numeric - numeric.mean()) / numeric.std().replace(0, 1)).fillna(0).clip(-Z_CLIP, Z_CLIP)
+        self.numeric = z.to_numpy(dtype=np.float32)
+        self.squares = (self.numeric ** 2).sum(axis=1)
+
+    def __len__(self):
+        return len(self.numeric)
+
+    # Similarity of every title to the title at position
+    def scores(self, position):
+        query = self.categorical[position].toarray().ravel()
+        distance = self.squares + self.squares[position] - 2 * (self.numeric @ self.numeric[position])
+        return self.categorical @ query - self.weights['numeric'] * distance / len(NUMERIC_FEATURES)
+
+    # Positions and similarities of the k titles most like the one at position, most similar
+    # first, leaving out the title itself
+    def similar(self, position, k=10):
+        scores = self.scores(position)
+        scores[position] = -np.inf
+        k = min(k, len(scores) - 1)
+        if k <= 0:
+            return np.array([], dtype=int), np.array([])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return top, scores[top]
@@ -0,0 +1,55 @@
+import glob
+import os
+import shutil
+import threading
+
+import joblib
+
+# Every cache file is written to a temporary file next to it first and then moved into
+# place, so a concurrent reader in another session, worker or server process never sees
+# a half-written file. Temporary names are unique per process and thread.
+
+
+#---------ATOMIC WRITES-------------
+
+# Calls write(temp) to write the file, then moves it to target
+def write_atomic(target, write):
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    temp = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        write(temp)
+        os.replace(temp, target)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    return target
+
+
+def write_bytes(target, content):
+    def write(temp):
+        with open(temp, 'wb') as f:
+            f.write(content)
+    return write_atomic(target, write)
+
+
+def dump(value, target):
+    return write_atomic(target, lambda temp: joblib.dump(value, temp))
+
+
+#---------STALE FILES-------------
+
+# Removes the files and directories matching pattern that are not in keep, and that
+# belongs(path) accepts when given. Other writers' temporary files are left alone.
+def drop_stale(pattern, keep=(), belongs=None):
+    for stale in glob.glob(pattern):
+        if stale in keep or stale.endswith('.tmp') or (belongs is not None and not belongs(stale)):
+            continue
+        if os.path.isdir(stale):
+            shutil.rmtree(stale, ignore_errors=True)
+        else:
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                # Already dropped by a concurrent writer
+                pass
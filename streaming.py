@@ -0,0 +1,148 @@
+import argparse
+import os
+import time
+import tracemalloc
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import aggregates
+import dataset
+import storage
+import versions
+
+# Opt-in: APP_STREAMING=1 makes the dashboard draw its charts from a summary read in chunks,
+# never holding the catalog in memory. Sections that need every title are left out.
+ENABLED = versions.STREAMING_ENABLED
+
+# Part of the summary file name; bumped whenever the summary's contents change
+SUMMARY_FORMAT = 3
+
+# Columns the summary reads; the rest of the export is never parsed
+USECOLS = ['MAL_ID', 'Name', 'Score', 'Genres', 'Type', 'Episodes', 'Aired', 'Premiered'] + [
+    column for column in aggregates.CUBE_MEASURES if column != 'Score']
+
+# Columns whose exact value counts are kept, for histograms and descriptive statistics.
+# They have few distinct values: scores have two decimals and episode counts are whole.
+COUNTED_COLUMNS = ['Score', 'Episodes']
+
+# Scatter charts of the dashboard: x, y, and whether each axis is drawn on a log scale
+SCATTERS = [('Score', 'Members', False, True), ('Episodes', 'Score', True, False)]
+
+# Scored titles kept for the data preview
+HEAD_ROWS = 5
+
+
+def add_counts(first, second):
+    return first.add(second, fill_value=0).astype(np.int64)
+
+
+#---------STREAMING SUMMARY-------------
+
+# Everything the charts draw, as partial aggregates that add up exactly: cube summaries,
+# season summaries, value counts, genre x score counts and scatter moments. Scatter points are the one part
+# that is sampled, within the point budget. Its size depends on the distinct years, types,
+# genres and values, not on the number of titles.
+class StreamingSummary:
+
+    # The summary of one chunk of cleaned titles
+    def __init__(self, chunk):
+        scored = chunk[aggregates.scored_rows(chunk)]
+        self.rows = len(chunk)
+        self.head = scored.head(HEAD_ROWS)
+        self.cube = aggregates.AggregateCube(chunk)
+        self.seasons = aggregates.summarize_by_season(chunk)
+        self.counts = {column: chunk[column].value_counts() for column in COUNTED_COLUMNS}
+        self.scored_counts = {column: scored[column].value_counts() for column in COUNTED_COLUMNS}
+
+        rated = chunk[['Genre List', 'Score']].dropna(subset=['Score']).explode('Genre List').dropna()
+        self.genre_scores = rated.groupby(['Genre List', 'Score']).size().rename_axis(['Genre', 'Score'])
+
+        self.scatters = {(x, y): aggregates.scatter_summary(chunk, x, y, aggregates.SCATTER_POINT_BUDGET, log_x, log_y)
+                         for x, y, log_x, log_y in SCATTERS}
+
+    # Adds the titles summarized by other to this summary
+    def merge(self, other):
+        self.rows += other.rows
+        if len(self.head) < HEAD_ROWS:
+            self.head = pd.concat([self.head, other.head]).head(HEAD_ROWS)
+        self.cube.set_summaries(aggregates.add_summaries(self.cube.by_type, other.cube.by_type),
+                                aggregates.add_summaries(self.cube.by_genre, other.cube.by_genre))
+        self.seasons = aggregates.add_summaries(self.seasons, other.seasons)
+        for column in COUNTED_COLUMNS:
+            self.counts[column] = add_counts(self.counts[column], other.counts[column])
+            self.scored_counts[column] = add_counts(self.scored_counts[column], other.scored_counts[column])
+        self.genre_scores = add_counts(self.genre_scores, other.genre_scores)
+        for x, y, log_x, log_y in SCATTERS:
+            self.scatters[x, y] = aggregates.merge_scatter(self.scatters[x, y], other.scatters[x, y], x, y,
+                                                           aggregates.SCATTER_POINT_BUDGET, log_x, log_y)
+        return self
+
+    # Histogram of a counted column over the scored titles
+    def histogram(self, column):
+        counts = self.scored_counts[column]
+        return aggregates.Histogram(counts.index, weights=counts.to_numpy())
+
+    # Series.describe() of a counted column over every title
+    def describe(self, column):
+        return aggregates.describe_counts(self.counts[column])
+
+    # Number of rated titles of a genre at each score
+    def genre_score_counts(self, genre):
+        return self.genre_scores.xs(genre, level='Genre')
+
+
+# Summary of the CSV, read chunk_rows titles at a time
+def summarize_csv(path=dataset.ANIME_CSV, chunk_rows=dataset.CHUNK_ROWS, log=None):
+    summary = None
+    for i, chunk in enumerate(dataset.read_chunks(path, USECOLS, chunk_rows)):
+        part = StreamingSummary(chunk)
+        summary = part if summary is None else summary.merge(part)
+        if log:
+            log(f'chunk {i + 1}: {summary.rows:,} titles')
+    return summary
+
+
+#---------STORED SUMMARY-------------
+
+def summary_path(path=dataset.ANIME_CSV, cache_dir=dataset.CACHE_DIR):
+    return f'{dataset.cache_prefix(path, cache_dir)}-summary-{dataset.data_version(path)}-v{SUMMARY_FORMAT}.joblib'
+
+
+def write_summary(summary, path=dataset.ANIME_CSV, cache_dir=dataset.CACHE_DIR):
+    target = storage.dump(summary, summary_path(path, cache_dir))
+
+    # Dropping summaries of older versions of the same CSV
+    storage.drop_stale(f'{dataset.cache_prefix(path, cache_dir)}-summary-*.joblib', keep=[target])
+    return target
+
+
+# The summary of the CSV's current version, read from disk when it was summarized before
+def load_summary(path=dataset.ANIME_CSV, cache_dir=dataset.CACHE_DIR, chunk_rows=dataset.CHUNK_ROWS):
+    target = summary_path(path, cache_dir)
+    if os.path.exists(target):
+        return joblib.load(target)
+    summary = summarize_csv(path, chunk_rows)
+    write_summary(summary, path, cache_dir)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize the anime dataset in chunks, with bounded memory')
+    parser.add_argument('csv', nargs='?', default=dataset.ANIME_CSV)
+    parser.add_argument('--chunk-rows', type=int, default=dataset.CHUNK_ROWS)
+    parser.add_argument('--cache-dir', default=dataset.CACHE_DIR)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    tracemalloc.start()
+    summary = summarize_csv(args.csv, args.chunk_rows, log=print)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f'{summary.rows:,} titles in {time.perf_counter() - started:.2f}s, peak {peak / 2 ** 20:.1f} MB traced')
+    print(write_summary(summary, args.csv, args.cache_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Rows in the 2020 MyAnimeList dump anime.csv comes from; scale 1 generates this many
+BASE_ROWS = 17562
+
+# Rows generated and written at a time, so large scales never sit in memory whole
+CHUNK_ROWS = 100000
+
+COLUMNS = ['MAL_ID', 'Name', 'Score', 'Genres', 'English name', 'Japanese name', 'Type', 'Episodes',
+           'Aired', 'Premiered', 'Producers', 'Licensors', 'Studios', 'Source', 'Duration', 'Rating',
+           'Ranked', 'Popularity', 'Members', 'Favorites', 'Watching', 'Completed', 'On-Hold', 'Dropped',
+           'Plan to Watch', 'Score-10', 'Score-9', 'Score-8', 'Score-7', 'Score-6', 'Score-5', 'Score-4',
+           'Score-3', 'Score-2', 'Score-1']
+
+# Titles per value in the real dataset
+TYPES = {'TV': 4996, 'OVA': 3894, 'Movie': 3041, 'Special': 2218, 'ONA': 1907, 'Music': 1469, 'Unknown': 37}
+
+GENRES = {
+    'Comedy': 6029, 'Action': 3888, 'Fantasy': 3285, 'Adventure': 2957, 'Kids': 2665, 'Drama': 2655,
+    'Sci-Fi': 2616, 'Music': 2251, 'Shounen': 2003, 'Slice of Life': 1914, 'Romance': 1836,
+    'School': 1542, 'Supernatural': 1431, 'Hentai': 1348, 'Historical': 1147, 'Mecha': 1107,
+    'Magic': 1083, 'Seinen': 898, 'Ecchi': 770, 'Mystery': 743, 'Sports': 708, 'Parody': 707,
+    'Shoujo': 665, 'Super Power': 625, 'Military': 542, 'Space': 465, 'Psychological': 450,
+    'Demons': 441, 'Horror': 394, 'Harem': 388, 'Martial Arts': 384, 'Dementia': 367, 'Game': 349,
+    'Police': 244, 'Samurai': 148, 'Josei': 126, 'Cars': 121, 'Thriller': 117, 'Shounen Ai': 113,
+    'Vampire': 107, 'Shoujo Ai': 86, 'Yaoi': 59, 'Yuri': 42,
+}
+
+# Named studios with their title counts; the rest of the catalog spreads over a long tail
+STUDIOS = {
+    'Toei Animation': 636, 'Sunrise': 486, 'J.C.Staff': 362, 'Madhouse': 340, 'TMS Entertainment': 319,
+    'Production I.G': 281, 'Studio Deen': 266, 'Studio Pierrot': 236, 'OLM': 221, 'A-1 Pictures': 215,
+    'Nippon Animation': 206, 'Shin-Ei Animation': 204, 'AIC': 196, 'Tatsunoko Production': 176,
+    'DLE': 174, 'Xebec': 154, 'Bones': 139, 'Kyoto Animation': 127, 'Gonzo': 126, 'Shaft': 122,
+}
+STUDIO_TAIL = 1200
+UNKNOWN_STUDIO_SHARE = 0.4
+
+SOURCES = ['Original', 'Manga', 'Unknown', 'Light novel', 'Visual novel', 'Game', 'Novel', 'Other']
+RATINGS = ['PG-13 - Teens 13 or older', 'G - All Ages', 'PG - Children', 'R - 17+ (violence & profanity)',
+           'Rx - Hentai', 'R+ - Mild Nudity', 'Unknown']
+MONTHS = np.array(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'])
+SEASONS = np.array(['Winter', 'Spring', 'Summer', 'Fall'])
+
+FIRST_YEAR, LAST_YEAR = 1917, 2021
+UNSCORED_SHARE = 0.29
+
+
+def weights(counts):
+    values = np.array(list(counts.values()), dtype=float)
+    return values / values.sum()
+
+
+def text(values):
+    return pd.Series(values).astype(str)
+
+
+#---------COLUMN GENERATORS-------------
+
+# Genre strings of 1 to 12 distinct genres, drawn by frequency and listed alphabetically
+def genre_strings(rng, rows):
+    names = np.array(list(GENRES))
+    lengths = np.clip(1 + rng.poisson(2.0, rows), 1, 12)
+
+    # Weighted sampling without replacement: the top keys of log(weight) + Gumbel noise
+    keys = np.log(weights(GENRES)) + rng.gumbel(size=(rows, len(names)))
+    picked = np.argsort(-keys, axis=1)
+    genres = [', '.join(sorted(names[row[:length]])) for row, length in zip(picked, lengths)]
+
+    genres = pd.Series(genres, dtype=object)
+    genres[rng.random(rows) < 0.004] = 'Unknown'
+    return genres
+
+
+# Air dates in the dataset's formats: 'Apr 3, 1998 to Apr 24, 1999' for series,
+# 'Jul 14, 2001' for one-offs, a bare year for some old titles and 'Not available'
+def aired_strings(rng, rows, types):
+    # Releases grow roughly exponentially towards the present
+    years = np.arange(FIRST_YEAR, LAST_YEAR + 1)
+    year_weights = np.exp((years - LAST_YEAR) / 12)
+    start_year = rng.choice(years, rows, p=year_weights / year_weights.sum())
+    start_month = rng.integers(0, 12, rows)
+    start = text(MONTHS[start_month]) + ' ' + text(rng.integers(1, 29, rows)) + ', ' + text(start_year)
+
+    # Runs of a few months, with a long tail of multi-year series
+    end_months = start_month + rng.geometric(0.25, rows)
+    end_year = start_year + end_months // 12
+    end = text(MONTHS[end_months % 12]) + ' ' + text(rng.integers(1, 29, rows)) + ', ' + text(end_year)
+
+    series = np.isin(types, ['TV', 'ONA']) & (rng.random(rows) < 0.9)
+    aired = start.where(~series, start + ' to ' + end)
+    aired[rng.random(rows) < 0.02] = text(start_year)
+    aired[rng.random(rows) < 0.02] = 'Not available'
+
+    premiered = text(SEASONS[start_month // 3]) + ' ' + text(start_year)
+    premiered = premiered.where(types == 'TV', 'Unknown')
+    return aired, premiered
+
+
+def episode_counts(rng, rows, types):
+    episodes = np.ones(rows, dtype=int)
+    tv = types == 'TV'
+    episodes[tv] = np.clip(rng.lognormal(2.8, 0.8, tv.sum()).round(), 1, 3057)
+    short = np.isin(types, ['OVA', 'ONA', 'Special'])
+    episodes[short] = np.clip(rng.lognormal(0.8, 1.0, short.sum()).round(), 1, 500)
+    episodes = text(episodes)
+    episodes[rng.random(rows) < 0.03] = 'Unknown'
+    return episodes
+
+
+def studio_names(rng, rows):
+    names = list(STUDIOS) + [f'Studio {i}' for i in range(STUDIO_TAIL)]
+    # Zipf-like tail continuing below the smallest named studio
+    tail = min(STUDIOS.values()) / (1 + np.arange(STUDIO_TAIL)) ** 0.8
+    counts = np.concatenate([list(STUDIOS.values()), tail])
+    studios = pd.Series(rng.choice(names, rows, p=counts / counts.sum()), dtype=object)
+    studios[rng.random(rows) < UNKNOWN_STUDIO_SHARE] = 'Unknown'
+    return studios
+
+
+#---------CATALOG-------------
+
+# `rows` titles shaped like anime.csv, with ids starting at first_id. Every value is a
+# string in the dataset's own format, including its 'Unknown' placeholders.
+def generate(rows, seed=0, first_id=1):
+    rng = np.random.default_rng(seed)
+    ids = np.arange(first_id, first_id + rows)
+    types = rng.choice(list(TYPES), rows, p=weights(TYPES))
+
+    score = np.clip(rng.normal(6.51, 0.89, rows), 1.85, 9.19).round(2)
+    unscored = rng.random(rows) < UNSCORED_SHARE
+
+    # Members are heavy tailed; better scored titles draw larger audiences
+    members = np.maximum(rng.lognormal(7.0 + np.where(unscored, -1.5, score - 6.5), 2.0), 1).astype(int)
+    engagement = rng.dirichlet([2, 30, 2, 2, 10], rows)
+    favorites = (members * rng.beta(0.5, 60, rows)).astype(int)
+    popularity = pd.Series(members).rank(ascending=False, method='first').astype(int)
+    ranked = pd.Series(np.where(unscored, np.nan, score)).rank(ascending=False, method='first')
+
+    aired, premiered = aired_strings(rng, rows, types)
+    votes = (members[:, None] * rng.dirichlet(np.ones(10), rows) * 0.5).astype(int)
+
+    catalog = pd.DataFrame({
+        'MAL_ID': ids,
+        'Name': [f'Title {i}' for i in ids],
+        'Score': text(score).where(~unscored, 'Unknown'),
+        'Genres': genre_strings(rng, rows),
+        'English name': text([f'English {i}' for i in ids]).where(rng.random(rows) < 0.4, 'Unknown'),
+        'Japanese name': [f'アニメ{i}' for i in ids],
+        'Type': types,
+        'Episodes': episode_counts(rng, rows, types),
+        'Aired': aired,
+        'Premiered': premiered,
+        'Producers': rng.choice(['Unknown', 'Aniplex', 'Bandai Visual', 'Lantis', 'TV Tokyo'], rows),
+        'Licensors': rng.choice(['Unknown', 'Funimation', 'Sentai Filmworks', 'VIZ Media'], rows),
+        'Studios': studio_names(rng, rows),
+        'Source': rng.choice(SOURCES, rows),
+        'Duration': text(rng.integers(1, 30, rows)) + ' min. per ep.',
+        'Rating': rng.choice(RATINGS, rows),
+        'Ranked': text(ranked.fillna(0).astype(int)).where(ranked.notna(), 'Unknown'),
+        'Popularity': popularity,
+        'Members': members,
+        'Favorites': favorites,
+    })
+    for column, share in zip(['Watching', 'Completed', 'On-Hold', 'Dropped', 'Plan to Watch'], engagement.T):
+        catalog[column] = (members * share).astype(int)
+    for i, column in enumerate(COLUMNS[-10:]):
+        catalog[column] = text(votes[:, 9 - i]).where(~unscored, 'Unknown')
+    return catalog[COLUMNS]
+
+
+# Writes a catalog of BASE_ROWS * scale titles to path, a chunk at a time
+def write_csv(path, scale=1, seed=0, chunk_rows=CHUNK_ROWS):
+    rows = int(BASE_ROWS * scale)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    for i, start in enumerate(range(0, rows, chunk_rows)):
+        chunk = generate(min(chunk_rows, rows - start), seed=(seed, i), first_id=start + 1)
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic anime.csv-shaped catalog')
+    parser.add_argument('output')
+    parser.add_argument('--scale', type=float, default=1, help=f'multiple of {BASE_ROWS} rows')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(write_csv(args.output, args.scale, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from scipy import sparse
+
+# Name columns searched; a title matches on its best-matching name
+NAME_COLUMNS = ['Name', 'English name', 'Japanese name']
+
+# Placeholder the dataset uses for a missing name
+MISSING_NAME = 'Unknown'
+
+# Matches scoring below this are left out of the results
+MIN_SCORE = 0.3
+
+
+# Positions and trigrams of a column of names, one pair per trigram occurrence. Names are
+# compatibility-normalized and lowercased so 'ＮＡＲＵＴＯ' and 'Naruto!' match, and every word is
+# padded with two spaces in front and one behind so short queries and word starts have
+# trigrams of their own. Built with Arrow compute kernels, looping over character positions
+# rather than over names.
+def trigram_pairs(names):
+    names = pd.Series(names, dtype=object)
+    # Normalized by Python, as Arrow's NFKC leaves some characters decomposed
+    names = pa.array(names.where(names != MISSING_NAME).str.normalize('NFKC'), type=pa.string(), from_pandas=True)
+    text = pc.replace_substring_regex(pc.utf8_lower(names), r'[^\pL\pM\pN]+', ' ')
+    lists = pc.utf8_split_whitespace(text)
+    words, positions = pc.list_flatten(lists), pc.list_parent_indices(lists)
+    # Separators at either end leave empty words
+    present = pc.greater(pc.utf8_length(words), 0)
+    words = pc.binary_join_element_wise('  ', pc.filter(words, present), ' ', '')
+    positions = pc.filter(positions, present).to_numpy()
+    lengths = pc.utf8_length(words).to_numpy()
+
+    parts = []
+    for i in range(lengths.max(initial=3) - 2):
+        fits = lengths > i + 2
+        parts.append((positions[fits], pc.utf8_slice_codeunits(pc.filter(words, fits), i, i + 3)))
+    return np.concatenate([p for p, _ in parts]), pa.concat_arrays([g for _, g in parts])
+
+
+#---------TITLE INDEX-------------
+
+# Sparse title x trigram matrix per name column over one trigram vocabulary. A query looks up
+# only the columns of its own trigrams, so it costs a few sparse column sums, not a scan of
+# every name. Rows follow the positions of the frame the index was built from.
+#
+# score = (shared / query trigrams + shared / union of trigrams) / 2
+#
+# The first part ranks names containing every typed trigram first, so partial words match
+# as the user types; the second prefers names with little else in them.
+class TitleIndex:
+
+    def __init__(self, anime, columns=NAME_COLUMNS):
+        pairs = [trigram_pairs(anime[column]) for column in columns]
+        encoded = pa.concat_arrays([grams for _, grams in pairs]).dictionary_encode()
+        codes = encoded.indices.to_numpy()
+        self.vocabulary = pd.Index(encoded.dictionary.to_pylist())
+
+        # Column-major so that a query's trigrams are contiguous slices. A trigram occurring
+        # twice in a name counts once.
+        self.matrices = []
+        start = 0
+        for rows, grams in pairs:
+            matrix = sparse.csc_matrix((np.ones(len(rows), dtype=np.float32), (rows, codes[start:start + len(rows)])),
+                                       shape=(len(anime), len(self.vocabulary)))
+            start += len(rows)
+            matrix.data[:] = 1
+            self.matrices.append((matrix, matrix.getnnz(axis=1)))
+
+        # Ties go to the title with more members
+        self.members = anime['Members'].fillna(0).to_numpy(dtype=np.float64)
+
+    def __len__(self):
+        return len(self.members)
+
+    # Score of every title for a query, its best over the name columns
+    def scores(self, query):
+        grams = pd.unique(trigram_pairs([query])[1].to_numpy(zero_copy_only=False))
+        ids = self.vocabulary.get_indexer(grams)
+        ids = ids[ids >= 0]
+        best = np.zeros(len(self))
+        if not len(ids):
+            return best
+        for matrix, sizes in self.matrices:
+            shared = np.asarray(matrix[:, ids].sum(axis=1)).ravel()
+            union = np.maximum(sizes + len(grams) - shared, 1)
+            np.maximum(best, (shared / len(grams) + shared / union) / 2, out=best)
+        return best
+
+    # Positions and scores of the k best matches, best first
+    def search(self, query, k=10, min_score=MIN_SCORE):
+        scores = self.scores(query)
+        matches = np.flatnonzero(scores >= min_score)
+        if len(matches) > k:
+            # Every title tied with the k-th score stays in, so ties are settled by members
+            kth = -np.partition(-scores[matches], k - 1)[k - 1]
+            matches = matches[scores[matches] >= kth]
+        matches = matches[np.lexsort((-self.members[matches], -scores[matches]))][:k]
+        return matches, scores[matches]
@@ -0,0 +1,56 @@
+import glob
+import hashlib
+import os
+
+# Data versions and the file locations they are read from. Every cache is keyed on a data
+# version, so it is computed from file sizes and modification times only. This module imports
+# nothing but the standard library: the warm-up readiness probe runs it on every health check
+# without loading pandas or scikit-learn.
+
+ANIME_CSV = 'anime.csv'
+
+# Cleaned copies of the CSV and everything derived from them
+CACHE_DIR = '.cache'
+
+# Delta CSV files applied on top of anime.csv; see refresh.py
+DELTA_DIR = 'deltas'
+
+# The streaming mode of streaming.py, opt-in with APP_STREAMING=1
+STREAMING_ENABLED = os.environ.get('APP_STREAMING', '0') == '1'
+
+# Ends the data version of reports built from a streaming summary
+STREAMING_SUFFIX = '-streaming'
+
+
+#---------DATA VERSION-------------
+
+# Changes whenever the CSV is replaced or edited, so caches keyed on it are refreshed
+def file_version(path=ANIME_CSV):
+    stat = os.stat(path)
+    return f'{stat.st_size}-{stat.st_mtime_ns}'
+
+
+def delta_files(delta_dir=DELTA_DIR):
+    return sorted(glob.glob(os.path.join(delta_dir, '*.csv')))
+
+
+def delta_key(path):
+    stat = os.stat(path)
+    return f'{os.path.basename(path)}:{stat.st_size}-{stat.st_mtime_ns}'
+
+
+# Version of anime.csv plus its deltas. Without deltas it is anime.csv's own version.
+def data_version(path=ANIME_CSV, delta_dir=DELTA_DIR):
+    keys = [delta_key(delta) for delta in delta_files(delta_dir)]
+    if not keys:
+        return file_version(path)
+    digest = hashlib.sha1('\n'.join(keys).encode()).hexdigest()[:12]
+    return f'{file_version(path)}-{digest}'
+
+
+# Version of the report and charts. Streaming mode reads no deltas, and its reports are kept
+# apart from the full ones.
+def report_version(path=ANIME_CSV, delta_dir=DELTA_DIR, streamed=False):
+    if streamed:
+        return f'{file_version(path)}{STREAMING_SUFFIX}'
+    return data_version(path, delta_dir)
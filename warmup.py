@@ -0,0 +1,130 @@
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+import versions
+
+# The readiness probe runs on every health check, so this module imports only the standard
+# library and versions at the top. warm_up imports the modules that fill the caches.
+
+# Written into the cache directory once every cache of a data version is in place
+READY_FILE = 'ready.json'
+
+# Part of the ready marker; bumped whenever warm-up fills a new cache, so older markers no
+# longer count as ready
+WARMUP_FORMAT = 2
+
+
+#---------WARM-UP-------------
+
+def ready_path(cache_dir=versions.CACHE_DIR):
+    return os.path.join(cache_dir, READY_FILE)
+
+
+# Fills every cache the app reads for the current data version, in the order a first visit
+# would: the cleaned frame and its aggregates, the report, the rendered charts, the rating
+# models and the animations. Each step only computes what is missing, so warming an
+# already warm cache takes seconds. The ready marker is written last. Estimators and
+# model_dir default to rating_model's.
+def warm_up(path=versions.ANIME_CSV, delta_dir=versions.DELTA_DIR, cache_dir=versions.CACHE_DIR, streamed=False,
+            estimators=None, model_dir=None, workers=None, log=None):
+    import analytics
+    import assets
+    import export
+    import rating_model
+    import refresh
+    import storage
+    import streaming
+
+    estimators = estimators or (rating_model.DEFAULT_ESTIMATOR,)
+    model_dir = model_dir or rating_model.MODEL_DIR
+    version = versions.report_version(path, delta_dir, streamed)
+    seconds = {}
+
+    def step(name, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        seconds[name] = time.perf_counter() - started
+        if log:
+            log(f'{name:<24} {seconds[name]:8.2f}s')
+        return result
+
+    if streamed:
+        step('summary', streaming.load_summary, path, cache_dir)
+    else:
+        anime, _ = step('dataset', refresh.refresh, path, delta_dir, cache_dir)
+    step('report', analytics.load_report, path, delta_dir, cache_dir, streamed)
+    files = [analytics.report_path(path, delta_dir, cache_dir, streamed)]
+    files.append(step('charts', export.render_charts, path, delta_dir, cache_dir, streamed, workers))
+    # Streaming mode has no frame to train on and no predictor page
+    if not streamed:
+        for estimator in estimators:
+            step(f'model {estimator}', rating_model.load_or_train, anime, version, None, model_dir, estimator)
+            files.append(rating_model.model_path(version, None, model_dir, estimator))
+    if assets.REFRESH_ENABLED:
+        step('animations', assets.fetch_missing, assets.LOTTIE_URLS.values())
+
+    marker = {
+        'version': version,
+        'streamed': streamed,
+        'format': WARMUP_FORMAT,
+        'estimators': list(estimators),
+        'files': files,
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'seconds': seconds,
+    }
+    storage.write_bytes(ready_path(cache_dir), json.dumps(marker, indent=2).encode())
+    return marker
+
+
+#---------READINESS-------------
+
+# Whether the last warm-up covered the current data version and everything it stored is still
+# there. A new delta file or CSV makes the instance unready until warm-up runs again.
+def is_ready(path=versions.ANIME_CSV, delta_dir=versions.DELTA_DIR, cache_dir=versions.CACHE_DIR, streamed=False):
+    try:
+        with open(ready_path(cache_dir)) as f:
+            marker = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (marker.get('format') == WARMUP_FORMAT and marker.get('streamed') == streamed
+            and marker.get('version') == versions.report_version(path, delta_dir, streamed)
+            and all(os.path.exists(file) for file in marker.get('files', [])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill every cache of the app before it takes traffic')
+    parser.add_argument('csv', nargs='?', default=versions.ANIME_CSV)
+    parser.add_argument('--delta-dir', default=versions.DELTA_DIR)
+    parser.add_argument('--cache-dir', default=versions.CACHE_DIR)
+    parser.add_argument('--model-dir', default=None, help='where to store the rating models (default: rating_model.MODEL_DIR)')
+    parser.add_argument('--estimators', nargs='+', default=None,
+                        help='rating models to train, from rating_model.ESTIMATORS (default: random-forest)')
+    parser.add_argument('--workers', type=int, default=None, help='processes to render charts with (default: one per CPU)')
+    parser.add_argument('--streaming', action='store_true', default=versions.STREAMING_ENABLED,
+                        help='warm the streaming mode caches (default: on when APP_STREAMING=1)')
+    parser.add_argument('--check', action='store_true',
+                        help='only report readiness: exit 0 when warm for the current data, 1 otherwise')
+    args = parser.parse_args()
+
+    if args.check:
+        ready = is_ready(args.csv, args.delta_dir, args.cache_dir, args.streaming)
+        print('ready' if ready else 'not ready')
+        sys.exit(0 if ready else 1)
+
+    import rating_model
+    unknown = sorted(set(args.estimators or ()) - set(rating_model.ESTIMATORS))
+    if unknown:
+        parser.error(f"unknown estimators: {', '.join(unknown)} (choose from {', '.join(rating_model.ESTIMATORS)})")
+
+    started = time.perf_counter()
+    marker = warm_up(args.csv, args.delta_dir, args.cache_dir, args.streaming, args.estimators, args.model_dir,
+                     args.workers, log=print)
+    print(f"{marker['version']} ready in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()